@@ -792,6 +792,8 @@ class Etl(DbLocal):
                  help="cache data in local CSV files")
     @localmethod('-n', '--no-database', action='store_false', default=True, dest='write_to_db',
                  help="Do not write data to database")
+    @localmethod('-i', '--incremental', action='store_true',
+                 help="request only entries created or updated since the last load")
     def wufoo(self, args, parser):
         """load initial survey data"""
         if not os.getenv('WUFOO_API_KEY'):
@@ -807,6 +809,7 @@ class Etl(DbLocal):
             (('-f', f'^{args.year} ') if args.year else ()),
             (('--stage', args.stage) if args.stage else ()),
             ('--no-database' if not args.write_to_db else ()),
+            ('--incremental' if args.incremental else ()),
             ('output' if args.csv_cache else '-'),
         ]
 
@@ -815,8 +818,10 @@ class Etl(DbLocal):
                  help="either execute command, or inspect state of system "
                       "only, do not load applications (default: execute)")
     @localmethod('-d', '--dry-run', action='store_true',
-                 help="do not commit database transactions so as to test effect "
-                      "of command")
+                 help="plan the command's changes via read-only queries, and "
+                      "report their effect, without writing anything")
+    @localmethod('-i', '--incremental', action='store_true',
+                 help="process only survey entries created or updated since the last run")
     @localmethod('--invite-only', action='append', metavar='EMAIL',
                  help="consider only *these* reviewer records, indicated by email "
                       "address, and do not process any other dataset")
@@ -832,10 +837,10 @@ class Etl(DbLocal):
             SMTP_PASSWORD=None,
         )[
             'loadapps',
-            (('-s', f'_{args.year}') if args.year else ()),
             (('--year', args.year) if args.year else ()),
             (('--closed',) if args.stage == 'review' else ()),
             ('--dry-run' if args.dry_run else ()),
+            ('--incremental' if args.incremental else ()),
             ([f'--invite-only={email}' for email in args.invite_only] if args.invite_only else ()),
             ([f'--email-ignore={email}' for email in args.email_ignore] if args.email_ignore else ()),
             args.subcommand,
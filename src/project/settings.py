@@ -177,6 +177,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+#
+# Values derived from the database (reviewer eligibility, the survey catalog)
+# are cached per process, and invalidated across processes via versions in
+# the shared cache, (its table created by migration -- see review.localcache).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'review_cache',
+    },
+}
+
+
 # Email
 
 DEFAULT_FROM_EMAIL = 'DSSG application review <appy@review.dssg.io>'
@@ -187,12 +206,21 @@ REVIEWER_REPLY_TO_EMAIL = APPLICATION_REPLY_TO_EMAIL
 
 INTERVIEW_CC_EMAIL = APPLICATION_REPLY_TO_EMAIL
 
-EMAIL_HOST = 'email-smtp.us-west-2.amazonaws.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+# (host may be overridden, e.g. to test against a local SMTP sink)
+EMAIL_HOST = os.getenv('SMTP_HOST', 'email-smtp.us-west-2.amazonaws.com')
+EMAIL_PORT = int(os.getenv('SMTP_PORT', 587))
+EMAIL_USE_TLS = bool_environ('SMTP_TLS', 'true')
 EMAIL_HOST_USER = os.getenv('SMTP_USER')
 EMAIL_HOST_PASSWORD = os.getenv('SMTP_PASSWORD')
 
+# bulk email (see review.mailpool): number of parallel SMTP connections,
+# and maximum messages sent per second, (the SES sending quota)
+REVIEW_EMAIL_CONNECTIONS = int(os.getenv('SMTP_CONNECTIONS', 4))
+REVIEW_EMAIL_RATE = float(os.getenv('SMTP_RATE', 14))
+
+# ...and number of processes across which to render messages, (if any)
+REVIEW_EMAIL_RENDER_PROCESSES = int(os.getenv('EMAIL_RENDER_PROCESSES', 0))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
@@ -247,6 +275,57 @@ REVIEW_PROGRAM_YEAR = 2022
 REVIEW_SURVEY_LENGTH = 2
 REVIEW_REVIEWER_APPROVED = True
 REVIEW_WHITELIST = set(filter(None, os.getenv('REVIEW_WHITELIST', '').split(' ')))
+REVIEW_ELIGIBILITY_CACHE_TIMEOUT = 60 * 60 * 24
+REVIEW_CACHE_VERSION_TIMEOUT = 60
+REVIEW_LOAD_MAX_AGE = 60 * 60 * 24
+REVIEW_WUFOO_HANDSHAKE_KEY = os.getenv('WUFOO_HANDSHAKE_KEY')
+
+REVIEW_SURVEY_CATALOG = {
+    # <form name>: (
+    #       survey.FieldRole(<role>, <title pattern>, <title occurrence>, <default field ID>),
+    #       ...
+    #
+    # Roles are resolved to form fields by loadwufoo, (and written to the
+    # catalog table), such that commands needn't depend upon field IDs.
+    'application_1': (
+        survey.FieldRole('app_first', r'^first$', 0, 'Field451'),
+        survey.FieldRole('app_last', r'^last$', 0, 'Field452'),
+        survey.FieldRole('app_email', r'email', 0, 'Field461'),
+        survey.FieldRole('ref0_first', r'^first$', 1, 'Field668'),
+        survey.FieldRole('ref0_last', r'^last$', 1, 'Field669'),
+        survey.FieldRole('ref0_email', r'email', 1, 'Field670'),
+        survey.FieldRole('ref1_first', r'^first$', 2, 'Field671'),
+        survey.FieldRole('ref1_last', r'^last$', 2, 'Field672'),
+        survey.FieldRole('ref1_email', r'email', 2, 'Field673'),
+    ),
+    'application_2': (
+        survey.FieldRole('app_email', r'^email$', 0, 'Field461'),
+    ),
+    'recommendation': (
+        survey.FieldRole('app_email', r'^applicant email', 0, 'Field461'),
+        survey.FieldRole('ref_first', r'^first$', -1, 'Field675'),
+        survey.FieldRole('ref_last', r'^last$', -1, 'Field676'),
+        survey.FieldRole('ref_email', r'^your email', 0, 'Field677'),
+    ),
+    'reviewer': (
+        survey.FieldRole('first_name', r'^first$', 0, 'Field1'),
+        survey.FieldRole('last_name', r'^last$', 0, 'Field2'),
+        survey.FieldRole('email', r'email', 0, 'Field3'),
+        survey.FieldRole('association', r'associat|affiliat', 0, 'Field4'),
+        survey.FieldRole('is_reviewer', r'review', 0, 'Field7'),
+        survey.FieldRole('is_interviewer', r'interview', 0, 'Field8'),
+    ),
+}
+
+# Catalog roles of the survey table columns on which loadwufoo creates lower()
+# expression indexes, (as these are joined and searched case-insensitively).
+REVIEW_SURVEY_INDEXED_ROLES = (
+    'app_email',
+    'ref0_email',
+    'ref1_email',
+    'ref_email',
+    'email',
+)
 
 REVIEW_APPLICATION_FIELDS = {
     # <"page" table>: (
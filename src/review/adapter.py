@@ -4,18 +4,77 @@ import allauth.socialaccount.signals
 from allauth.socialaccount.providers.base import AuthProcess
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
 
 
 class ApplicationAdapter(allauth.account.adapter.DefaultAccountAdapter):
     """Account adapter for communication with *non-account* holders
     (applicants, references, *etc.*).
 
+    Email templates are resolved and compiled once per adapter, (and
+    then rendered per message), as bulk sends use only a handful.
+
     """
     period_prefix = getattr(settings, 'APPLICATION_EMAIL_SUBJECT_PREFIX', '')
 
+    def __init__(self, request=None):
+        super().__init__(request)
+        self._mail_templates = {}
+
     def format_email_subject(self, subject):
         return f'{self.period_prefix}{subject}'
 
+    def get_mail_templates(self, template_prefix):
+        """Retrieve the compiled subject template and body templates
+        (by extension) of the given email template prefix.
+
+        """
+        try:
+            return self._mail_templates[template_prefix]
+        except KeyError:
+            pass
+
+        subject_template = get_template(f'{template_prefix}_subject.txt')
+
+        body_templates = {}
+        for ext in ('html', 'txt'):
+            try:
+                body_templates[ext] = get_template(f'{template_prefix}_message.{ext}')
+            except TemplateDoesNotExist:
+                if ext == 'txt' and not body_templates:
+                    # we need at least one body
+                    raise
+
+        templates = self._mail_templates[template_prefix] = (subject_template, body_templates)
+        return templates
+
+    def render_mail(self, template_prefix, email, context):
+        # as DefaultAccountAdapter.render_mail, but via cached templates
+        to = [email] if isinstance(email, str) else email
+
+        (subject_template, body_templates) = self.get_mail_templates(template_prefix)
+
+        # remove superfluous line breaks
+        subject = ' '.join(subject_template.render(context).splitlines()).strip()
+        subject = self.format_email_subject(subject)
+
+        from_email = self.get_from_email()
+
+        bodies = {ext: template.render(context, self.request).strip()
+                  for (ext, template) in body_templates.items()}
+
+        if 'txt' in bodies:
+            msg = EmailMultiAlternatives(subject, bodies['txt'], from_email, to)
+            if 'html' in bodies:
+                msg.attach_alternative(bodies['html'], 'text/html')
+        else:
+            msg = EmailMessage(subject, bodies['html'], from_email, to)
+            msg.content_subtype = 'html'  # main content is now text/html
+
+        return msg
+
 
 class TrustingSocialAccountAdapter(allauth.socialaccount.adapter.DefaultSocialAccountAdapter):
     """Social account adapter allowing for automatic sign-in via trusted
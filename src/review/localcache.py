@@ -0,0 +1,73 @@
+"""Per-process caching of values derived from the database, invalidated
+across processes.
+
+Values are cached in each process's local (default) cache, keyed by the
+current version of their scope -- such as a program year -- as recorded
+in the shared cache, (table review_cache). Each process holds on to the
+versions it retrieves for `version_timeout` seconds, such that a cached
+lookup usually costs no query at all; and, the invalidation of a scope
+(by replacement of its version) takes effect in other processes once
+their versions expire.
+
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+LOCAL_CACHE = 'default'
+
+SHARED_CACHE = 'shared'
+
+VERSION_TIMEOUT = getattr(settings, 'REVIEW_CACHE_VERSION_TIMEOUT', 60)
+
+
+class VersionedCache:
+    """Per-process cache of values, by scope and key, under the given
+    namespace.
+
+    """
+    def __init__(self, namespace, timeout, version_timeout=VERSION_TIMEOUT):
+        self.namespace = namespace
+        self.timeout = timeout
+        self.version_timeout = version_timeout
+
+        # this process's versions of each scope: (version, expiry)
+        self._versions = {}
+
+    def _version_key(self, scope):
+        return f'{self.namespace}:{scope}:version'
+
+    def _set_version(self, scope, version):
+        self._versions[scope] = (version, time.monotonic() + self.version_timeout)
+
+    def version(self, scope):
+        (version, expiry) = self._versions.get(scope, (None, 0))
+
+        if time.monotonic() >= expiry:
+            version = caches[SHARED_CACHE].get_or_set(self._version_key(scope),
+                                                      lambda: uuid.uuid4().hex,
+                                                      None)
+            self._set_version(scope, version)
+
+        return version
+
+    def make_key(self, scope, key):
+        return f'{self.namespace}:{scope}:{self.version(scope)}:{key}'
+
+    def get(self, scope, key, default=None):
+        return caches[LOCAL_CACHE].get(self.make_key(scope, key), default)
+
+    def set(self, scope, key, value):
+        caches[LOCAL_CACHE].set(self.make_key(scope, key), value, self.timeout)
+
+    def invalidate(self, scope):
+        """Invalidate all values cached under the given scope, (by all
+        processes).
+
+        """
+        version = uuid.uuid4().hex
+        caches[SHARED_CACHE].set(self._version_key(scope), version, None)
+        self._set_version(scope, version)
@@ -0,0 +1,209 @@
+"""Parallel rendering and sending of email.
+
+Messages are sent by worker threads -- each holding open an SMTP
+connection of its own, (as configured by Django's EMAIL_* settings) --
+at no more than a global rate of messages per second, (such as an SES
+sending quota). (See `review.outbox`.)
+
+Messages are rendered in order, and lazily, on the calling thread.
+Optionally, rendering may instead be spread across a pool of (forked)
+processes.
+
+"""
+import collections
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core import mail
+
+
+CONNECTIONS = getattr(settings, 'REVIEW_EMAIL_CONNECTIONS', 4)
+
+RATE = getattr(settings, 'REVIEW_EMAIL_RATE', None)
+
+RENDER_PROCESSES = getattr(settings, 'REVIEW_EMAIL_RENDER_PROCESSES', 0)
+
+BATCH_SIZE = 30
+
+
+class RateLimiter:
+    """Thread-safe limiter of events to the given rate per second,
+    (spaced evenly).
+
+    Without a rate, events are unlimited.
+
+    """
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def acquire(self):
+        """Block until the next event is permitted."""
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(self._next, now) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Rendered(collections.namedtuple('Rendered', ('item', 'message', 'error'))):
+    """An item of email rendered (or which failed to render)."""
+
+    __slots__ = ()
+
+    def get_message(self):
+        if self.error is not None:
+            raise self.error
+
+        return self.message
+
+
+def render_each(render_item, items):
+    for item in items:
+        try:
+            yield Rendered(item, render_item(item), None)
+        except Exception as exc:
+            yield Rendered(item, None, exc)
+
+
+def render_batch(render_item, batch):
+    """Render the given batch of items, (in a rendering process)."""
+    return list(render_each(render_item, batch))
+
+
+def render(render_item, items, size=BATCH_SIZE, processes=RENDER_PROCESSES):
+    """Render the given items of email via the given callable, generating
+    each `Rendered`, in order.
+
+    Given a number of rendering `processes`, items are rendered by these
+    in batches of the given size, (in which case `render_item` must be
+    picklable), retrieved from the given items only so far ahead as
+    twice the number of processes.
+
+    """
+    if not processes:
+        yield from render_each(render_item, items)
+        return
+
+    # (forked such that rendering processes inherit configuration)
+    with ProcessPoolExecutor(max_workers=processes,
+                             mp_context=multiprocessing.get_context('fork')) as renderers:
+        futures = prefetch(
+            (renderers.submit(render_batch, render_item, batch)
+             for batch in split_batches(items, size)),
+            2 * processes,
+        )
+
+        for future in futures:
+            yield from future.result()
+
+
+class ConnectionPool:
+    """Pool of SMTP connections, one per (worker) thread, via which
+    messages are sent in parallel, at no more than the given rate.
+
+    """
+    def __init__(self, rate=RATE, get_connection=mail.get_connection):
+        self.limiter = RateLimiter(rate)
+        self.get_connection = get_connection
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            connection = self.get_connection()
+            connection.open()
+            self._local.connection = connection
+
+            with self._lock:
+                self._connections.append(connection)
+
+        return connection
+
+    def discard_connection(self):
+        """Close the current thread's connection, (such that the next
+        is opened anew).
+
+        """
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is not None:
+            del self._local.connection
+
+            with self._lock:
+                self._connections.remove(connection)
+
+            close_quietly(connection)
+
+    def close(self):
+        with self._lock:
+            (connections, self._connections) = (self._connections, [])
+
+        for connection in connections:
+            close_quietly(connection)
+
+    def send_message(self, message):
+        """Send the given message via the current thread's connection,
+        (subject to the pool's rate limit).
+
+        A connection which fails to send is discarded, (such that
+        subsequent messages are sent via a new connection).
+
+        """
+        self.limiter.acquire()
+
+        try:
+            return self.connection.send_messages([message])
+        except Exception:
+            # connection is suspect: reconnect for subsequent messages
+            self.discard_connection()
+            raise
+
+
+def split_batches(items, size):
+    iterator = iter(items)
+    return iter(lambda: tuple(itertools.islice(iterator, size)), ())
+
+
+def prefetch(futures, count):
+    """Generate the given futures, in order, with up to the given count
+    submitted ahead of those generated.
+
+    """
+    pending = collections.deque()
+
+    for future in futures:
+        pending.append(future)
+
+        if len(pending) >= count:
+            yield pending.popleft()
+
+    yield from pending
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
@@ -1,24 +1,51 @@
 from django.conf import settings
 
+from review.models import SurveyFieldRole
 
-APPLICANT_SURVEY_FIELDS = (
-    ('app_first', 'Field451'),
-    ('app_last', 'Field452'),
-    ('app_email', 'Field461'),
-    ('ref0_first', 'Field668'),
-    ('ref0_last', 'Field669'),
-    ('ref0_email', 'Field670'),
-    ('ref1_first', 'Field671'),
-    ('ref1_last', 'Field672'),
-    ('ref1_email', 'Field673'),
+
+APPLICANT_SURVEY_ROLES = (
+    'app_first',
+    'app_last',
+    'app_email',
+    'ref0_first',
+    'ref0_last',
+    'ref0_email',
+    'ref1_first',
+    'ref1_last',
+    'ref1_email',
 )
 
-REFERENCE_SURVEY_FIELDS = (
-    ('ref_first', 'Field675'),
-    ('ref_last', 'Field676'),
-    ('ref_email', 'Field677'),
+REFERENCE_SURVEY_ROLES = (
+    'ref_first',
+    'ref_last',
+    'ref_email',
 )
 
 REFERENCE_FORM_URL = ('https://datascience.wufoo.com/forms/'
                       f'?formname={settings.REVIEW_PROGRAM_YEAR}-dssg-fellow-recommendation-form'
-                      '&field461={app_email}')
+                      '&{app_email_field}={app_email}')
+
+
+def survey_fields(form_name, roles, program_year=None):
+    """Look up (role, field ID) pairs of the given survey form's fields
+    in the survey catalog.
+
+    """
+    field_ids = SurveyFieldRole.objects.field_ids(form_name, program_year)
+    return tuple((role, field_ids[role]) for role in roles)
+
+
+def applicant_survey_fields(program_year=None):
+    return survey_fields('application_1', APPLICANT_SURVEY_ROLES, program_year)
+
+
+def reference_survey_fields(program_year=None):
+    return survey_fields('recommendation', REFERENCE_SURVEY_ROLES, program_year)
+
+
+def form_url_field(form_name, role='app_email', program_year=None):
+    """Wufoo URL parameter, (with which to pre-fill the form), of the
+    given survey form field role.
+
+    """
+    return SurveyFieldRole.objects.field_id(form_name, role, program_year).lower()
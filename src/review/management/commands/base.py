@@ -1,10 +1,14 @@
 import collections
+import functools
+import hashlib
 import itertools
+import json
 
 from django.conf import settings
-from django.core import mail
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 
+from review import mailpool, models, outbox
 from review.adapter import ApplicationAdapter
 
 
@@ -43,6 +47,33 @@ def exhaust_iterable(iterable):
     collections.deque(iterable, maxlen=0)
 
 
+# commands rendering messages in this process, (by class)
+_renderers = {}
+
+def render_item(command_class, item):
+    """Render the given item of email via an instance of the given
+    command class, (for rendering processes).
+
+    """
+    try:
+        command = _renderers[command_class]
+    except KeyError:
+        command = _renderers[command_class] = command_class()
+
+    return command.make_message(*item)
+
+
+class DailyCycleMixin:
+    """Send cycle of commands whose messages (such as reminders) may be
+    repeated daily.
+
+    """
+    cycle_description = "today's date"
+
+    def get_default_cycle(self):
+        return timezone.localdate().isoformat()
+
+
 class ApplicationEmailCommand(BaseCommand):
 
     default_reply_to_email = getattr(settings, 'APPLICATION_REPLY_TO_EMAIL', ())
@@ -51,6 +82,47 @@ class ApplicationEmailCommand(BaseCommand):
         super().__init__(*args, **kwargs)
         self.adapter = ApplicationAdapter()
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueue-only',
+            action='store_true',
+            help="only enqueue messages in the outbox, to be sent by command "
+                 "drainoutbox, (rather than sending these as well)",
+        )
+        parser.add_argument(
+            '--cycle',
+            help="send cycle, in which each message is enqueued at most once: "
+                 "specify that reported by an interrupted run to resume it "
+                 f"(default: {self.cycle_description})",
+        )
+
+    cycle_description = "the program year"
+
+    def get_default_cycle(self):
+        """Identify the current send cycle, in which each message is to
+        be enqueued (and sent) at most once.
+
+        """
+        return str(settings.REVIEW_PROGRAM_YEAR)
+
+    @staticmethod
+    def get_test_cycle():
+        """Identify a send cycle particular to this invocation, such that
+        test messages are sent by every (test) run.
+
+        """
+        return f'test:{timezone.now().isoformat()}'
+
+    def resolve_cycle(self, cycle=None, test=False):
+        """Resolve the send cycle of this invocation: that specified,
+        else that of a test run, else the default.
+
+        """
+        if cycle:
+            return cycle
+
+        return self.get_test_cycle() if test else self.get_default_cycle()
+
     def make_message(self, template_prefix, email, context, cc=None, reply_to=None):
         # allauth really dragging their feet on exposing EmailMessage interface...
         #
@@ -76,19 +148,65 @@ class ApplicationEmailCommand(BaseCommand):
         msg = self.make_message(*args, **kwargs)
         msg.send()
 
-    def generate_messages(self, items):
-        for item in items:
-            yield self.make_message(*item)
+    @staticmethod
+    def make_idempotency_key(cycle, template_prefix, email, context, cc=None, reply_to=None):
+        """Construct the outbox key of the given item of email, such
+        that it is enqueued at most once in the given send cycle.
+
+        """
+        signature = json.dumps(
+            [cycle, template_prefix, email.lower(), cc, reply_to, context],
+            default=str,
+            sort_keys=True,
+        )
+        return hashlib.sha256(signature.encode()).hexdigest()
+
+    def enqueue_mail(self, items, cycle, size=mailpool.BATCH_SIZE,
+                     processes=mailpool.RENDER_PROCESSES):
+        """Render the given items of email and enqueue these in the
+        outbox, in batches, (see `review.outbox`).
+
+        Items already enqueued in the given send cycle are skipped. Messages are rendered on
+        this thread or (given a number of `processes`) by a pool of
+        processes, (see `review.mailpool`). Returns the number of
+        messages enqueued.
+
+        """
+        if processes:
+            render = functools.partial(render_item, type(self))
+        else:
+            render = lambda item: self.make_message(*item)
+
+        rendered = mailpool.render(render, self.skip_enqueued(items, cycle, size), size, processes)
+
+        enqueue_count = 0
+
+        for batch in split_every(rendered, size):
+            enqueue_count += models.OutboxMessage.objects.enqueue(
+                (self.make_idempotency_key(cycle, *result.item), result.item[0], result.get_message())
+                for result in batch
+            )
+
+        return enqueue_count
+
+    def skip_enqueued(self, items, cycle, size):
+        """Generate those of the given items of email which have not
+        already been enqueued, (looked up in batches).
+
+        """
+        for batch in split_every(items, size):
+            keys = [self.make_idempotency_key(cycle, *item) for item in batch]
+            existing = models.OutboxMessage.objects.existing_keys(keys)
 
-    def send_mass_mail(self, items):
-        with mail.get_connection() as connection:
-            return connection.send_messages(self.generate_messages(items))
+            for (key, item) in zip(keys, batch):
+                if key not in existing:
+                    yield item
 
-    def send_batched_mail(self, items, size=30):
-        send_count = 0
+    def drain_outbox(self):
+        """Send the messages of the outbox which are due.
 
-        with mail.get_connection() as connection:
-            for batch in split_every(items, size):
-                send_count += connection.send_messages(self.generate_messages(batch))
+        Returns counts of messages sent, rescheduled (`retry`) and given
+        up on (`failed`).
 
-        return send_count
+        """
+        return outbox.drain(log=self.stderr.write)
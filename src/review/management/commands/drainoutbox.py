@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from review import mailpool, outbox
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Send the email messages enqueued in the outbox (by commands such as sendstatus), "
+        "in parallel, with retry. Safe to run concurrently and to resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-c', '--connections',
+            default=mailpool.CONNECTIONS,
+            type=int,
+            help=f"number of parallel SMTP connections (default: {mailpool.CONNECTIONS})",
+        )
+        parser.add_argument(
+            '--rate',
+            default=mailpool.RATE,
+            type=float,
+            help=f"maximum messages sent per second (default: {mailpool.RATE})",
+        )
+        parser.add_argument(
+            '--max-attempts',
+            default=outbox.MAX_ATTEMPTS,
+            type=int,
+            help="number of attempts to send each message before giving up "
+                 f"(default: {outbox.MAX_ATTEMPTS})",
+        )
+        parser.add_argument(
+            '--backoff',
+            default=outbox.BACKOFF,
+            metavar='SECONDS',
+            type=float,
+            help="delay before retrying a failed message, doubled with each attempt "
+                 f"(default: {outbox.BACKOFF})",
+        )
+
+    def handle(self, connections, rate, max_attempts, backoff, **_options):
+        counts = outbox.drain(
+            connections=connections,
+            rate=rate,
+            max_attempts=max_attempts,
+            backoff=backoff,
+            log=self.stderr.write,
+        )
+        self.stderr.write(
+            f"I: sent {counts['sent']}, to retry {counts['retry']}, failed {counts['failed']}"
+        )
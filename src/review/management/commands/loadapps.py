@@ -1,4 +1,6 @@
 import argparse
+import collections
+import re
 
 from allauth.account.models import EmailAddress
 from django.conf import settings
@@ -7,6 +9,7 @@ from django.core.exceptions import ValidationError
 from django.core.management.base import BaseCommand, CommandError
 from django.core.validators import validate_email
 from django.db import connection, transaction
+from django.db.models.functions import Lower
 from terminaltables import AsciiTable
 
 from review import models
@@ -35,14 +38,14 @@ class Command(BaseCommand):
         parser.add_argument(
             '-d', '--dry-run',
             action='store_true',
-            help="do not commit database transactions so as to test effect "
-                 "of command",
+            help="plan the command's changes via read-only queries, and "
+                 "report their effect, without writing anything",
         )
         parser.add_argument(
             '-s', '--suffix',
-            default=f'_{settings.REVIEW_PROGRAM_YEAR}',
             help="Suffix to apply to the names of survey tables from which command should read. "
-                 f"Default: _{settings.REVIEW_PROGRAM_YEAR}. "
+                 "Default: that of the program year (--year), e.g. "
+                 f"_{settings.REVIEW_PROGRAM_YEAR}. "
                  "E.g.: If the first page of application survey data has been loaded into "
                  "table \"survey_application_1_2018\", then specify \"_2018\".",
         )
@@ -76,6 +79,12 @@ class Command(BaseCommand):
             help="Do not email these reviewers, indicated by email address, "
                  "(and do still process other datasets)",
         )
+        parser.add_argument(
+            '-i', '--incremental',
+            action='store_true',
+            help="process only those survey entries created or updated since the "
+                 "previous run (as recorded in table survey_link_state)",
+        )
         parser.add_argument(
             '-y', '--year',
             default=settings.REVIEW_PROGRAM_YEAR,
@@ -99,12 +108,273 @@ class Command(BaseCommand):
         table = AsciiTable(*args, **kwargs)
         self.stdout.write(table.table)
 
-    def handle(self, entity_id_field, suffix, closed, year, subcommand, invite_only, email_ignore, dry_run, **_options):
+    def link_entries(self, entry_model, table_name, entity_id_field, email_field, year, incremental, plan):
+        """Link the entries of the given survey table to applications,
+        (incrementally or in full), and record its high-water marks --
+        or, to `plan`, only count the changes which this would make.
+
+        Returns the number of entries processed, created and updated,
+        and (if planned) of applicants created.
+
+        """
+        since = models.SurveyLinkState.objects.filter(table_name=table_name).first() if incremental else None
+
+        if plan:
+            return entry_model.objects.plan_table(table_name, entity_id_field, email_field, year, since)
+
+        mark = models.SurveyLinkState.objects.mark(table_name, entity_id_field)
+
+        counts = entry_model.objects.link_table(table_name, entity_id_field, email_field, year, since)
+
+        # record marks only once entries' links are committed
+        transaction.on_commit(mark.save)
+
+        return counts + (None,)
+
+    @staticmethod
+    def sweep_entries(entry_model, year, plan):
+        """Delete the given model's stale links for the given year -- or,
+        to `plan`, only count these.
+
+        """
+        stale = entry_model.objects.stale_in_year(year)
+
+        if plan:
+            counts = stale.counts()
+            return (sum(counts.values()), counts)
+
+        return stale.delete()
+
+    def resolve_reviewers(self, emails, create=True):
+        """Map the given email addresses (by lower-case) to the IDs of
+        their reviewers, creating reviewers (named per the reviewer
+        directory) and email address records as necessary.
+
+        Email addresses claimed by multiple records are omitted. Unless
+        `create`, reviewers which would be created are mapped to None.
+
+        """
+        emails = {email.lower(): email for email in emails}
+
+        # (query matches expression index account_emailaddress_email_lower)
+        addresses = collections.defaultdict(set)
+        for (key, user_id) in (
+            EmailAddress.objects
+            .annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=emails)
+            .values_list('email_lower', 'user_id')
+        ):
+            addresses[key].add(user_id)
+
+        reviewer_ids = {}
+        for (key, user_ids) in addresses.items():
+            if len(user_ids) > 1:
+                self.stderr.write(f'multiple records for {emails[key]}')
+            else:
+                (reviewer_ids[key],) = user_ids
+
+        unaddressed = [key for key in emails if key not in addresses]
+
+        if unaddressed:
+            reviewers = {
+                reviewer.email.lower(): reviewer
+                for reviewer in models.Reviewer.objects.filter(email__in=unaddressed)
+            }
+
+            if not create:
+                reviewer_ids.update(
+                    (key, reviewers[key].pk if key in reviewers else None) for key in unaddressed
+                )
+                return reviewer_ids
+
+            # name new reviewers as most recently registered
+            directory = models.ReviewerDirectory.objects.get_by_emails(
+                key for key in unaddressed if key not in reviewers
+            )
+
+            first_name_length = models.Reviewer._meta.get_field('first_name').max_length
+            last_name_length = models.Reviewer._meta.get_field('last_name').max_length
+
+            new_reviewers = []
+            for key in unaddressed:
+                if key not in reviewers:
+                    entry = directory.get(key)
+                    reviewer = models.Reviewer(
+                        email=models.Reviewer.objects.normalize_email(emails[key]),
+                        first_name=entry.first_name[:first_name_length] if entry else '',
+                        last_name=entry.last_name[:last_name_length] if entry else '',
+                    )
+                    reviewer.set_password(None)
+                    reviewers[key] = reviewer
+                    new_reviewers.append(reviewer)
+
+            models.Reviewer.objects.bulk_create(new_reviewers)
+
+            EmailAddress.objects.bulk_create([
+                EmailAddress(user=reviewers[key], email=emails[key])
+                for key in unaddressed
+            ])
+
+            reviewer_ids.update(
+                (key, reviewers[key].pk) for key in unaddressed
+            )
+
+        return reviewer_ids
+
+    def elect_reviewers(self, reviewer_rows, create=True):
+        """Map the reviewers of the given reviewer signups, (email,
+        is_reviewer, is_interviewer), to their elections, with later
+        signups superseding earlier ones.
+
+        Unless `create`, reviewers which would be created are mapped by
+        (lower-case) email address, rather than by ID.
+
+        """
+        if not reviewer_rows:
+            return {}
+
+        reviewer_ids = self.resolve_reviewers(
+            (email for (email, _is_reviewer, _is_interviewer) in reviewer_rows),
+            create,
+        )
+
+        # a reviewer may sign up under several addresses: fold signups in
+        # order by reviewer, (such that the last of these supersedes)
+        elections = {}
+        for (email, is_reviewer, is_interviewer) in reviewer_rows:
+            key = email.lower()
+
+            if key in reviewer_ids:
+                elections[reviewer_ids[key] or key] = (email, is_reviewer, is_interviewer)
+
+        return elections
+
+    def plan_concessions(self, reviewer_rows, year):
+        """Count, without writing anything, the changes which
+        `sync_concessions` would make.
+
+        """
+        reviewer_elections = self.elect_reviewers(reviewer_rows, create=False)
+
+        concessions = {
+            reviewer_id: (is_reviewer, is_interviewer)
+            for (reviewer_id, is_reviewer, is_interviewer) in
+            models.ReviewerConcession.objects.filter(
+                program_year=year,
+                reviewer_id__in=[reviewer for reviewer in reviewer_elections
+                                 if not isinstance(reviewer, str)],
+            ).values_list('reviewer_id', 'is_reviewer', 'is_interviewer')
+        }
+
+        created = updated = 0
+        invitation_emails = []
+
+        for (reviewer, (email, is_reviewer, is_interviewer)) in reviewer_elections.items():
+            previous = concessions.get(reviewer)
+
+            if previous is None:
+                created += 1
+                was_reviewer = False
+            elif previous != (is_reviewer, is_interviewer):
+                updated += 1
+                was_reviewer = any(previous)
+            else:
+                continue
+
+            if (is_reviewer or is_interviewer) and not was_reviewer:
+                invitation_emails.append(email)
+
+        return (len(reviewer_rows), created, updated, invitation_emails)
+
+    def sync_concessions(self, cursor, reviewer_rows, year):
+        """Upsert the reviewer concessions of the given year from the
+        given reviewer signups, (email, is_reviewer, is_interviewer),
+        with later signups superseding earlier ones.
+
+        Returns the number of signups processed, and of concessions
+        created and updated, and the email addresses of reviewers
+        newly eligible for invitation.
+
+        """
+        reviewer_elections = self.elect_reviewers(reviewer_rows)
+
+        if not reviewer_elections:
+            return (len(reviewer_rows), 0, 0, [])
+
+        (reviewer_id_array, election_emails, is_reviewer_array, is_interviewer_array) = zip(*(
+            (reviewer_id, email, is_reviewer, is_interviewer)
+            for (reviewer_id, (email, is_reviewer, is_interviewer)) in reviewer_elections.items()
+        ))
+
+        table_name = models.ReviewerConcession._meta.db_table
+        cursor.execute(
+            f'''\
+                with election (reviewer_id, is_reviewer, is_interviewer) as (
+                    select * from unnest(%(reviewer_ids)s::int[],
+                                         %(is_reviewers)s::boolean[],
+                                         %(is_interviewers)s::boolean[])
+                ), previous as (
+                    select reviewer_id, (is_reviewer or is_interviewer) was_reviewer
+                    from {table_name}
+                    where program_year = %(program_year)s and
+                          reviewer_id in (select reviewer_id from election)
+                ), upsert as (
+                    insert into {table_name}
+                        (program_year, reviewer_id, is_reviewer, is_interviewer, created)
+                    select %(program_year)s, reviewer_id, is_reviewer, is_interviewer, now()
+                    from election
+                    on conflict (program_year, reviewer_id) do update
+                    set is_reviewer = excluded.is_reviewer,
+                        is_interviewer = excluded.is_interviewer
+                    where ({table_name}.is_reviewer, {table_name}.is_interviewer)
+                          is distinct from (excluded.is_reviewer, excluded.is_interviewer)
+                    returning reviewer_id, (xmax = 0) created
+                )
+                select election.reviewer_id,
+                       upsert.created,
+                       coalesce(previous.was_reviewer, false),
+                       (election.is_reviewer or election.is_interviewer)
+                from election
+                join upsert using (reviewer_id)
+                left join previous using (reviewer_id)
+            ''',
+            {
+                'program_year': year,
+                'reviewer_ids': list(reviewer_id_array),
+                'is_reviewers': list(is_reviewer_array),
+                'is_interviewers': list(is_interviewer_array),
+            },
+        )
+
+        emails = dict(zip(reviewer_id_array, election_emails))
+        created = updated = 0
+        invitation_emails = []
+
+        for (reviewer_id, was_created, was_reviewer, is_reviewer) in cursor.fetchall():
+            if was_created:
+                created += 1
+            else:
+                updated += 1
+
+            if is_reviewer and not was_reviewer:
+                invitation_emails.append(emails[reviewer_id])
+
+        return (len(reviewer_rows), created, updated, invitation_emails)
+
+    def handle(self, entity_id_field, suffix, closed, year, subcommand, invite_only, email_ignore, dry_run, incremental, **_options):
+        # survey tables and their catalog are of the same (program) year
+        if suffix is None:
+            suffix = f'_{year}'
+        else:
+            suffix_year = re.fullmatch(r'_(\d+)', suffix)
+            if suffix_year and int(suffix_year.group(1)) != year:
+                raise CommandError(f"suffix {suffix} does not match program year "
+                                   f"(--year {year})")
+
         self.survey_1_table_name = 'survey_application_1' + suffix
         self.survey_2_table_name = 'survey_application_2' + suffix
         self.recommendation_table_name = 'survey_recommendation' + suffix
         self.reviewer_table_name = 'survey_reviewer' + suffix
-        self.fields_2_table_name = 'survey_application_2_fields' + suffix
 
         if closed and invite_only:
             raise CommandError(
@@ -115,17 +385,29 @@ class Command(BaseCommand):
         if invite_only and email_ignore:
             raise CommandError("incompatible arguments (--invite-only, --email-ignore)")
 
+        # look up survey fields' roles (applicant email, etc.) in the survey
+        # catalog up front: the catalog is cached, and the cache may write,
+        # (which the read-only transaction of a dry run would reject)
+        self.field_ids = {
+            form_name: models.SurveyFieldRole.objects.field_ids(form_name, year)
+            for form_name in ('application_1', 'application_2', 'recommendation', 'reviewer')
+        }
+
         handler = getattr(self, 'command_' + subcommand)
         with connection.cursor() as cursor:
             try:
                 with transaction.atomic():
-                    handler(cursor, entity_id_field, year, closed, invite_only, email_ignore, dry_run)
+                    if dry_run:
+                        # dry runs only plan their changes: guard against writes
+                        cursor.execute('set transaction read only')
+
+                    handler(cursor, entity_id_field, year, closed, invite_only, email_ignore, dry_run, incremental)
                     if dry_run:
                         raise self.DryRunAbort()
             except self.DryRunAbort:
                 self.stdout.write('transaction rolled back for dry run')
 
-    def command_inspect(self, cursor, _entity_id_field, _year, _closed, _invite_only, _email_ignore, _dry_run):
+    def command_inspect(self, cursor, _entity_id_field, _year, _closed, _invite_only, _email_ignore, _dry_run, _incremental):
         self.write_table(
             [('table', 'raw', 'linked')] +
             [
@@ -164,173 +446,131 @@ class Command(BaseCommand):
             'recommendations loaded',
         )
 
-    def command_execute(self, cursor, entity_id_field, year, closed, invite_only, email_ignore, dry_run):
-        # load field names
-        # NOTE: There are 3 "Email" columns in the "first" (second?) survey;
-        # NOTE: though, the field IDs appear to overlap across surveys, and
-        # NOTE: there's only one in the "second" (first?). So, at least for
-        # NOTE: now, we'll assume that's the applicant email field, in
-        # NOTE: *all* tables.
-        cursor.execute(f"""
-            select field_id from {self.fields_2_table_name}
-            where field_title ilike 'email'
-        """)
-        ((applicant_email_field,),) = cursor
+    def command_execute(self, cursor, entity_id_field, year, closed, invite_only, email_ignore, dry_run, incremental):
+        field_ids = self.field_ids
 
         # load application pages
         page_processed = page_created = page_updated = page_deleted = 0
-        survey_table_names = () if (closed or invite_only) else (
-            self.survey_1_table_name,
-            self.survey_2_table_name,
+        applicants_planned = {}
+        survey_tables = () if (closed or invite_only) else (
+            (self.survey_1_table_name, field_ids['application_1']['app_email']),
+            (self.survey_2_table_name, field_ids['application_2']['app_email']),
         )
-        for survey_table_name in survey_table_names:
-            survey_signature = {
-                'table_name': survey_table_name,
-                'column_name': entity_id_field,
-            }
-            cursor.execute(f'''
-                select "{entity_id_field}", "{applicant_email_field}"
-                from "{survey_table_name}"
-            ''')
-            for (page_processed, (entity_id, applicant_email)) in enumerate(cursor, page_processed + 1):
-                page_signature = dict(survey_signature, entity_code=entity_id)
-                with transaction.atomic():
-                    (applicant, _created) = models.Applicant.objects.get_or_create(email=applicant_email)
-                    try:
-                        application_page = models.ApplicationPage.objects.get(**page_signature)
-                    except models.ApplicationPage.DoesNotExist:
-                        (application, _created) = applicant.applications.get_or_create(program_year=year)
-                        application.applicationpage_set.create(**page_signature)
-                        page_created += 1
-                    else:
-                        if application_page.application.applicant != applicant:
-                            # page was *corrected*
-                            (application, _created) = applicant.applications.get_or_create(program_year=year)
-                            application_page.application = application
-                            application_page.save(update_fields=['application'])
-                            page_updated += 1
-
-            page_deleted += models.ApplicationPage.objects.stale(**survey_signature).delete()
+        for (survey_table_name, applicant_email_field) in survey_tables:
+            (processed, created, updated, applicants_planned[survey_table_name]) = self.link_entries(
+                models.ApplicationPage,
+                survey_table_name,
+                entity_id_field,
+                applicant_email_field,
+                year,
+                incremental,
+                dry_run,
+            )
+            page_processed += processed
+            page_created += created
+            page_updated += updated
+
+        # sweep stale links to application pages (of all tables) at once
+        stale_deleted = {}
+        if survey_tables:
+            (page_deleted, page_stale_deleted) = self.sweep_entries(models.ApplicationPage, year, dry_run)
+            stale_deleted.update(page_stale_deleted)
 
         # load recommendation(s)
         recommendation_processed = recommendation_created = recommendation_updated = recommendation_deleted = 0
-        recommendation_signature = {
-            'table_name': self.recommendation_table_name,
-            'column_name': entity_id_field,
-        }
-        if invite_only:
-            recommendation_rows = ()
-        else:
-            cursor.execute(f'''
-                select "{entity_id_field}", "{applicant_email_field}"
-                from "{self.recommendation_table_name}"
-            ''')
-            recommendation_rows = cursor
-        for (recommendation_processed, (entity_id, applicant_email)) in enumerate(recommendation_rows, recommendation_processed + 1):
-            entity_signature = dict(recommendation_signature, entity_code=entity_id)
-            with transaction.atomic():
-                (applicant, _created) = models.Applicant.objects.get_or_create(email=applicant_email)
-                try:
-                    recommendation = models.Reference.objects.get(**entity_signature)
-                except models.Reference.DoesNotExist:
-                    (application, _created) = applicant.applications.get_or_create(program_year=year)
-                    application.reference_set.create(**entity_signature)
-                    recommendation_created += 1
-                else:
-                    if recommendation.application.applicant != applicant:
-                        # recommendation was *corrected*
-                        (application, _created) = applicant.applications.get_or_create(program_year=year)
-                        recommendation.application = application
-                        recommendation.save(update_fields=['application'])
-                        recommendation_updated += 1
+        if not invite_only:
+            (
+                recommendation_processed,
+                recommendation_created,
+                recommendation_updated,
+                applicants_planned[self.recommendation_table_name],
+            ) = self.link_entries(
+                models.Reference,
+                self.recommendation_table_name,
+                entity_id_field,
+                field_ids['recommendation']['app_email'],
+                year,
+                incremental,
+                dry_run,
+            )
+            (recommendation_deleted, recommendation_stale_deleted) = self.sweep_entries(models.Reference, year, dry_run)
+            stale_deleted.update(recommendation_stale_deleted)
 
+        # derive application statuses from linked entries (for sendstatus)
+        status_processed = status_created = status_updated = status_deleted = 0
         if not invite_only:
-            recommendation_deleted += models.Reference.objects.stale(**recommendation_signature).delete()
+            status_method = (models.ApplicationStatus.objects.plan if dry_run
+                             else models.ApplicationStatus.objects.refresh)
+            (status_processed, status_created, status_updated, status_deleted) = status_method(
+                year,
+                entity_id_field,
+                (self.survey_1_table_name, self.survey_2_table_name, self.recommendation_table_name),
+                field_ids['application_1'],
+                field_ids['recommendation'],
+            )
 
         # load reviewer concessions
-        concessions_processed = concessions_created = concessions_updated = 0
-
         if closed or invite_only:
-            # FIXME: static field IDs
+            reviewer_fields = field_ids['reviewer']
             cursor.execute(f'''\
-                select "Field3" email, (
-                    case when "Field7" is null then false else true end
+                select "{reviewer_fields['email']}" email, (
+                    coalesce("{reviewer_fields['is_reviewer']}"::text, '') not in ('', 'false')
                 ) is_reviewer, (
-                    case when "Field8" is null then false else true end
+                    coalesce("{reviewer_fields['is_interviewer']}"::text, '') not in ('', 'false')
                 ) is_interviewer
                 from "{self.reviewer_table_name}"
             ''')
-            reviewer_rows = cursor
+            reviewer_rows = [
+                (email, is_reviewer, is_interviewer)
+                for (email, is_reviewer, is_interviewer) in cursor
+                if email and (not invite_only or email.lower() in invite_only)
+            ]
         else:
             reviewer_rows = ()
 
-        invitation_emails = []
-
-        for (concessions_processed, reviewer_data) in enumerate(reviewer_rows, concessions_processed + 1):
-            reviewer_election = {
-                col.name: value
-                for (col, value) in zip(cursor.description, reviewer_data)
-            }
-            reviewer_email = reviewer_election.pop('email')
-
-            if invite_only and reviewer_email.lower() not in invite_only:
-                continue
-
-            with transaction.atomic():
-                # FIXME: interview emails require interviewer name (and add'l information),
-                # FIXME: which could be collected/updated here....
-                try:
-                    email_address = EmailAddress.objects.get(email__iexact=reviewer_email)
-                except EmailAddress.MultipleObjectsReturned:
-                    self.stderr.write(f'multiple records for {reviewer_email}')
-                    continue
-                except EmailAddress.DoesNotExist:
-                    reviewer = models.Reviewer.objects.create_reviewer(reviewer_email, None)
-                    EmailAddress.objects.create(
-                        user=reviewer,
-                        email=reviewer_email,
-                    )
-                else:
-                    reviewer = email_address.user
-
-                (concession, created) = models.ReviewerConcession.objects.get_or_create(
-                    program_year=year,
-                    reviewer=reviewer,
-                    defaults=reviewer_election,
-                )
-
-            if created:
-                maybe_invite = concession.is_reviewer or concession.is_interviewer
-
-                concessions_created += 1
-            else:
-                is_reviewer = was_reviewer = must_update = False
-
-                for (key, value1) in reviewer_election.items():
-                    value0 = getattr(concession, key)
-
-                    is_reviewer = is_reviewer or value1
-                    was_reviewer = was_reviewer or value0
-                    must_update = must_update or value0 != value1
-
-                    setattr(concession, key, value1)
-
-                maybe_invite = is_reviewer and not was_reviewer
+        (
+            concessions_processed,
+            concessions_created,
+            concessions_updated,
+            invitation_emails,
+        ) = (
+            self.plan_concessions(reviewer_rows, year) if dry_run
+            else self.sync_concessions(cursor, reviewer_rows, year)
+        )
 
-                if must_update:
-                    concession.save(update_fields=tuple(reviewer_election))
-                    concessions_updated += 1
+        if email_ignore:
+            invitation_emails = [email for email in invitation_emails
+                                 if email.lower() not in email_ignore]
 
-            if maybe_invite and (not email_ignore or reviewer_email.lower() not in email_ignore):
-                invitation_emails.append(reviewer_email)
+        if closed or invite_only:
+            # concessions may have been written in bulk, etc.: (once committed)
+            # invalidate all cached reviewer eligibilities for the year
+            models.ReviewerEligibility.invalidate_on_commit(year)
 
         self.write_table([
             ('entity', 'processed', 'written', 'updated', 'deleted'),
             ('application pages', page_processed, page_created, page_updated, page_deleted),
             ('recommendations', recommendation_processed, recommendation_created, recommendation_updated, recommendation_deleted),
+            ('application statuses', status_processed, status_created, status_updated, status_deleted),
             ('reviewer concessions', concessions_processed, concessions_created, concessions_updated, '-'),
         ], 'results')
 
+        if stale_deleted:
+            self.write_table(
+                [('table', 'column', 'deleted')] +
+                [
+                    (table_name, column_name, count)
+                    for ((table_name, column_name), count) in sorted(stale_deleted.items())
+                ],
+                'stale entries',
+            )
+
+        if dry_run and applicants_planned:
+            self.write_table(
+                [('table', 'applicants')] + sorted(applicants_planned.items()),
+                'applicants to create (dry run)',
+            )
+
         if dry_run:
             for invitation_email in invitation_emails:
                 self.stdout.write(f"WOULD email (dry run): {invitation_email}")
@@ -1,17 +1,32 @@
+import concurrent.futures
+import contextlib
 import csv
 import enum
 import functools
+import io
 import itertools
+import json
 import os
 import pathlib
 import re
+import threading
+import time
 from urllib.parse import urlencode
 
-import ohio
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.db import connection
-from pyfoo import PyfooAPI, SearchParameter
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from review import pgcopy, snapshot, wufoo
+from review.models import (
+    ReviewerDirectory,
+    SurveyFieldRole,
+    SurveyLoad,
+    SurveySyncState,
+    get_survey_columns,
+)
+from review.wufoo import RECOMMENDATION_FORM, REVIEWER_FORM, SearchParameter, parse_value
 
 
 class Credentials(str, enum.Enum):
@@ -24,26 +39,37 @@ class Credentials(str, enum.Enum):
         return self.value
 
 
-# regular expressions to identify forms to load
-# and to capture their canonical names (case-insensitive)
+ENTRY_PAGE_SIZE = wufoo.ENTRY_PAGE_SIZE
+# NOTE: Also, the Wufoo API backend appears to ignore this
+# parameter ANYWAY....
 
-RECOMMENDATION_FORM = r'^(\d+) dssg fellow (recommendation) form$'
+ENTRY_CONCURRENCY = 4
 
-APPLICATION_FORM = r'^(\d+) dssg fellowship (application)(?:(?:[- ]+part)? (\d))?$'
+CACHE_TTL = 60 * 60  # 1 hour
 
-REVIEWER_FORM = r'^(\d+) dssg application (reviewer)(?: and scoper)? (?:registration|signup)$'
+FORM_PARALLELISM = 2
 
-FORMS = (
-    RECOMMENDATION_FORM,
-    APPLICATION_FORM,
-    REVIEWER_FORM,
-)
+ENTRY_FILTER_COMPLETE = SearchParameter('CompleteSubmission', 'Is_equal_to', '1')
 
-ENTRY_PAGE_SIZE = 100  # (Also the API default)
-# NOTE: Also, the Wufoo API backend appears to ignore this
-# parameter ANYWAY....
+# survey table column types
+# (by Wufoo field type -- otherwise citext -- and by system field name --
+# otherwise varchar)
 
-ENTRY_FILTER_COMPLETE = SearchParameter('CompleteSubmission', 'Is_equal_to', '1')
+FIELD_COLUMN_TYPES = {
+    'checkbox': 'boolean',
+    'date': 'date',
+    'number': 'numeric',
+}
+
+SYSTEM_COLUMN_TYPES = {
+    'DateCreated': 'timestamp without time zone',
+    'DateUpdated': 'timestamp without time zone',
+}
+
+FIELDS_TABLE_COLUMNS = (
+    ('field_id', 'character varying'),
+    ('field_title', 'character varying'),
+)
 
 
 class Command(BaseCommand):
@@ -75,6 +101,61 @@ class Command(BaseCommand):
             help="Include incomplete submission entries "
                  f"(see system field {ENTRY_FILTER_COMPLETE.field})",
         )
+        parser.add_argument(
+            '-c', '--concurrency',
+            default=ENTRY_CONCURRENCY,
+            type=int,
+            help="Number of pages of form entries to request from Wufoo concurrently "
+                 f"(default: {ENTRY_CONCURRENCY})",
+        )
+        parser.add_argument(
+            '-p', '--parallelism',
+            default=FORM_PARALLELISM,
+            type=int,
+            help="Number of forms to load concurrently, each with its own database connection "
+                 f"(default: {FORM_PARALLELISM})",
+        )
+        parser.add_argument(
+            '--api-url',
+            default=os.getenv('WUFOO_API_URL'),
+            metavar='URL',
+            help="Wufoo API base URL from which to request form entries "
+                 "(default: that of the Wufoo account -- see also: $WUFOO_API_URL)",
+        )
+        parser.add_argument(
+            '--cache',
+            default=os.getenv('WUFOO_CACHE_DIR'),
+            metavar='DIR',
+            dest='cache_path',
+            help="Directory in which to cache (compressed) Wufoo API responses "
+                 "(default: none -- see also: $WUFOO_CACHE_DIR)",
+        )
+        parser.add_argument(
+            '--cache-ttl',
+            default=CACHE_TTL,
+            metavar='SECONDS',
+            type=int,
+            help=f"Seconds after which cached API responses expire (default: {CACHE_TTL})",
+        )
+        parser.add_argument(
+            '--replay',
+            action='store_true',
+            help="Read only cached API responses (regardless of their age), "
+                 "and make no requests of the Wufoo API (requires --cache)",
+        )
+        parser.add_argument(
+            '--snapshot',
+            metavar='DIR',
+            dest='snapshot_path',
+            help="Directory to which to write as well a (compressed, columnar) snapshot "
+                 "of each form's entries, as these are loaded (requires pyarrow)",
+        )
+        parser.add_argument(
+            '--from-snapshot',
+            metavar='DIR',
+            help="Directory of snapshots from which to load forms' entries, "
+                 "rather than from Wufoo (requires pyarrow)",
+        )
         parser.add_argument(
             '-n', '--no-database',
             action='store_false',
@@ -116,6 +197,18 @@ class Command(BaseCommand):
             action='store_true',
             help="Recreate table schema rather than merely truncating and repopulating.",
         )
+        parser.add_argument(
+            '--swap',
+            action='store_true',
+            help="Build replacements of existing tables under shadow names, and swap these in "
+                 "(rather than truncating and repopulating tables in place).",
+        )
+        parser.add_argument(
+            '-i', '--incremental',
+            action='store_true',
+            help="Request only those entries created or updated since the last load "
+                 "(as recorded per table), and upsert these into existing database tables.",
+        )
 
         parser.add_argument(
             '--stage',
@@ -128,12 +221,15 @@ class Command(BaseCommand):
         super().__init__(*args, **kwargs)
         self.entity_id_field = None
         self.verbosity = None
+        self._local = threading.local()
 
     def handle(self, target='.', filters=(), entries_completed=True,
                write_to_db=True, apply_suffix=True, suffix=None, append=False,
                entity_id_field='EntryId', apply_pk=True,
-               recreate=False, stage=None,
-               verbosity=1, **_options):
+               recreate=False, swap=False, incremental=False, stage=None,
+               concurrency=ENTRY_CONCURRENCY, parallelism=FORM_PARALLELISM,
+               api_url=None, cache_path=None, cache_ttl=CACHE_TTL, replay=False,
+               snapshot_path=None, from_snapshot=None, verbosity=1, **_options):
         self.entity_id_field = entity_id_field
         self.verbosity = verbosity
 
@@ -141,6 +237,7 @@ class Command(BaseCommand):
             filters.append(f'^{settings.REVIEW_PROGRAM_YEAR} ')
             if target == '.':  # i.e. override default
                 target = '-'
+            swap = True
         elif stage == 'review':
             filters.extend((
                 f'^{settings.REVIEW_PROGRAM_YEAR} ',
@@ -148,123 +245,345 @@ class Command(BaseCommand):
             ))
             if target == '.':
                 target = '-'
+            swap = True
         elif stage is not None:
             raise CommandError('unexpected stage argument', stage)
 
         if target == '-' and not write_to_db:
             raise CommandError("Can only write to standard I/O without database – nothing to do")
 
-        client = PyfooAPI(*Credentials)
+        if swap and append:
+            raise CommandError("incompatible arguments (--swap, --append)")
 
-        for (form_count, (year, name, form)) in enumerate(stream_forms(client, filters)):
-            if form_count != 0:
-                self.report()
+        if incremental and (append or recreate or not apply_pk or not write_to_db):
+            raise CommandError("incremental load requires database tables with primary keys "
+                               "and is incompatible with: --append, --recreate, --no-database")
 
-            self.report('=' * (len(name) + 4))
-            self.report('=', name, '=')
-            self.report('=' * (len(name) + 4))
+        if replay and not cache_path:
+            raise CommandError("replay requires a cache (--cache)")
 
-            entries = stream_entries(form, completed=entries_completed)
-            fields = list(stream_fields(form))
+        if incremental and (snapshot_path or from_snapshot):
+            raise CommandError("incremental load is incompatible with: --snapshot, --from-snapshot")
 
-            # Peak ahead for entry column names
+        if snapshot_path and from_snapshot:
+            raise CommandError("incompatible arguments (--snapshot, --from-snapshot)")
+
+        if snapshot_path or from_snapshot:
             try:
-                head = next(entries)
-            except StopIteration:
-                head = None
-            else:
-                entries = itertools.chain((head,), entries)
-
-            # Prepare streams or eagerly write to disk
-            if target == '-':
-                data_paths = (None, None)
-                streams = (
-                    functools.partial(self.write_entries_csv, head, entries),
-                    functools.partial(self.write_fields_csv, head, fields),
-                )
-            else:
-                data_paths = self.write_disk(target, name, head, entries, fields)
-                streams = (None, None)
+                snapshot.import_pyarrow()
+            except ImportError as exc:
+                raise CommandError(exc)
 
-            # Write to database
-            if not write_to_db or not head:
-                continue
+        if from_snapshot:
+            make_client = functools.partial(snapshot.SnapshotClient, from_snapshot)
+        else:
+            cache = cache_path and wufoo.ResponseCache(cache_path, ttl=cache_ttl, replay=replay)
+
+            make_client = functools.partial(wufoo.Client, *Credentials,
+                                            api_url=api_url,
+                                            concurrency=concurrency,
+                                            cache=cache)
+
+        client = make_client(log=self.report)
+
+        load_form = functools.partial(
+            self.load_form,
+            target=target,
+            entries_completed=entries_completed,
+            write_to_db=write_to_db,
+            apply_suffix=apply_suffix,
+            suffix=suffix,
+            append=append,
+            apply_pk=apply_pk,
+            recreate=recreate,
+            swap=swap,
+            incremental=incremental,
+            snapshot_path=snapshot_path,
+            make_client=make_client,
+        )
+
+        forms = stream_forms(client, filters)
+
+        if parallelism <= 1:
+            for (form_count, (year, name, form)) in enumerate(forms):
+                if form_count != 0:
+                    self.report()
 
-            table_names = [f'survey_{name}',
-                           f'survey_{name}_fields']
-            if apply_suffix:
-                table_suffix = suffix or year
-                table_names = [table_name + f'_{table_suffix}'.lower()  # avoid psql name ambiguity
-                               for table_name in table_names]
+                load_form(year, name, form)
 
-            table_col_defns = [
-                # entries table columns
-                ', '.join(self.get_field_sql(field_name) for field_name in head),
+            return
 
-                # fields table columns
-                '"field_id" varchar, "field_title" varchar',
+        # load forms concurrently, each in its own thread (and so with its
+        # own database connection), buffering reports to write these out
+        # in order
+        with concurrent.futures.ThreadPoolExecutor(max_workers=parallelism) as executor:
+            futures = [
+                (form_count, executor.submit(self.load_form_buffered, load_form, year, name, form))
+                for (form_count, (year, name, form)) in enumerate(forms)
             ]
 
-            # maybe apply primary key to entries table, never to fields table
-            tables_apply_pk = (apply_pk, False)
+            try:
+                for (form_count, future) in futures:
+                    if form_count != 0:
+                        self.report()
+
+                    (buffer, error) = future.result()
+
+                    self.flush_report(buffer)
+
+                    if error is not None:
+                        raise error
+            except BaseException:
+                for (_form_count, future) in futures:
+                    future.cancel()
+
+                raise
+
+    def load_form_buffered(self, load_form, year, name, form):
+        """Load the given form (in a worker thread), buffering its
+        reports, and closing the thread's database connection when
+        complete.
+
+        """
+        buffer = self._local.buffer = []
+
+        try:
+            load_form(year, name, form)
+        except Exception as exc:
+            return (buffer, exc)
+        finally:
+            connection.close()
+            self._local.buffer = None
+
+        return (buffer, None)
+
+    def load_form(self, year, name, form, write_to_db, make_client, **options):
+        """Load the given form, and report the timings of its stages,
+        (as JSON, and to the load history).
+
+        """
+        client = make_client(log=self.bind_report(self.report))
+        metrics = LoadMetrics()
+        started = timezone.now()
+        succeeded = False
+
+        try:
+            self.load_form_tables(year, name, form, client, metrics,
+                                  write_to_db=write_to_db, **options)
+        except DatabaseError:
+            # (connection may not be usable to record load)
+            write_to_db = False
+            raise
+        else:
+            succeeded = True
+        finally:
+            # (entries are streamed lazily -- through to their COPY -- and so
+            # are only fully received once all stages have completed)
+            metrics.stage('fetch')['bytes'] = client.bytes_received
+
+            load = SurveyLoad(
+                form_name=name,
+                program_year=int(year),
+                started=started,
+                finished=timezone.now(),
+                succeeded=succeeded,
+                entries=metrics.stage('fetch')['rows'],
+                stages=metrics.summary(),
+            )
 
-            for (table_count, table_name, table_col_defn,
-                 data_path, stream, table_apply_pk) in zip(
-                    itertools.count(), table_names, table_col_defns,
-                    data_paths, streams, tables_apply_pk
-            ):
-                if table_count != 0:
-                    self.report()
+            self.report(json.dumps(load.summary()), minlevel=1)
+
+            if write_to_db:
+                try:
+                    load.save()
+                except Exception as exc:
+                    # (don't mask the error of the load itself)
+                    if succeeded:
+                        raise
 
-                table_name_tmp = f'{table_name}_tmp'
+                    self.warn(f"failed to record load of {name}: {exc}")
+
+    def load_form_tables(self, year, name, form, client, metrics, target, entries_completed,
+                         write_to_db, apply_suffix, suffix, append, apply_pk,
+                         recreate, swap, incremental, snapshot_path):
+        self.report('=' * (len(name) + 4))
+        self.report('=', name, '=')
+        self.report('=' * (len(name) + 4))
+
+        table_names = [f'survey_{name}',
+                       f'survey_{name}_fields']
+        if apply_suffix:
+            table_suffix = suffix or year
+            table_names = [table_name + f'_{table_suffix}'.lower()  # avoid psql name ambiguity
+                           for table_name in table_names]
+
+        sync_state = self.get_sync_state(table_names[0]) if incremental else None
+
+        if sync_state:
+            self.report("requesting entries created or updated since:",
+                        sync_state.last_entry_id, sync_state.last_modified or '-')
+
+        entries = metrics.measure('fetch', stream_entries(client, form,
+                                                          completed=entries_completed,
+                                                          since=sync_state))
+        with metrics.timer('fetch'):
+            fields = list(stream_fields(client, form))
+        field_types = {field_id: field_type for (field_id, _field_title, field_type) in fields}
+
+        # Peak ahead for entry column names
+        (head, entries) = peek_entries(entries)
+
+        if sync_state and head and (
+            self.get_entry_columns(head, field_types) != get_survey_columns(table_names[0])
+        ):
+            # form has changed: reload in full
+            self.report("entry columns do not match existing table:", table_names[0],
+                        "(will request all entries)")
+            sync_state = None
+            entries = metrics.measure('fetch', stream_entries(client, form,
+                                                              completed=entries_completed))
+            (head, entries) = peek_entries(entries)
+        elif sync_state and not head:
+            self.report("no entries created or updated since last load")
+
+        if snapshot_path and head:
+            path = snapshot.get_path(snapshot_path, name, year)
+            self.report("writing snapshot to:", path)
+            entries = metrics.measure('snapshot', snapshot.tee(entries, path, head, form, fields))
+
+        # Prepare streams or eagerly write to disk
+        if target == '-':
+            data_paths = (None, None)
+            sources = (
+                entries,
+                ({'field_id': field_id, 'field_title': field_title}
+                 for (field_id, field_title, _field_type) in fields
+                 if field_id and field_id in head),
+            )
+        else:
+            with metrics.timer('write'):
+                data_paths = self.write_disk(target, name, head, entries, fields)
 
-                with connection.cursor() as cursor:
-                    cursor.execute(f"select to_regclass('{table_name}')")
-                    (result,) = cursor.fetchone()
-                    table_exists = bool(result)
+            sources = tuple(read_csv(data_path) for data_path in data_paths)
 
-                direct_write = append or not table_exists
+        # Write to database
+        if not write_to_db or not head:
+            return
 
-                if direct_write:
-                    target_table_name = table_name
+        catalog = self.resolve_catalog(name, year, head, fields)
+        indexed_fields = [(field_role.role, field_id)
+                          for (field_role, (field_id, _field_title)) in catalog
+                          if field_role.role in settings.REVIEW_SURVEY_INDEXED_ROLES]
 
-                    if recreate and table_exists:
-                        # tear down old table
-                        self.op_drop_table(table_name)
-                        table_exists = False
-                else:
-                    target_table_name = table_name_tmp
+        tables_columns = [
+            self.get_entry_columns(head, field_types),
+            FIELDS_TABLE_COLUMNS,
+        ]
 
-                    self.execute_sql(f'create temp table {table_name_tmp} '
-                                     f'({table_col_defn})',
-                                     "creating temporary table:", table_name_tmp)
+        # maybe apply primary key to entries table, never to fields table
+        tables_apply_pk = (apply_pk, False)
 
-                if not table_exists:
-                    self.op_create_destination_table(table_name, table_col_defn, table_apply_pk)
+        for (table_count, table_name, table_columns,
+             data_path, source, table_apply_pk) in zip(
+                itertools.count(), table_names, tables_columns,
+                data_paths, sources, tables_apply_pk
+        ):
+            table_col_defn = ', '.join(self.get_field_sql(field_name, field_type)
+                                       for (field_name, field_type) in table_columns)
 
-                if data_path:
-                    self.report("copying file", data_path.name,
-                                "to database table:", target_table_name)
-                    # avoid weird carriage returns inside quoted strings
-                    # https://docs.python.org/3/library/csv.html#examples
-                    open_file = functools.partial(open, data_path, newline='')
-                else:
-                    self.report("streaming to database table:", target_table_name)
-                    open_file = functools.partial(ohio.PipeTextIO, stream)
+            if table_count != 0:
+                self.report()
 
-                with open_file() as infile, \
-                        connection.cursor() as cursor:
-                    cursor.copy_expert(
-                        f"copy {target_table_name} from stdin with csv header",
-                        infile,
-                    )
+            table_name_tmp = f'{table_name}_tmp'
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"select to_regclass('{table_name}')")
+                (result,) = cursor.fetchone()
+                table_exists = bool(result)
+
+            # existing tables of differing columns (or column types) must be recreated
+            table_recreate = recreate or (
+                table_exists and get_survey_columns(table_name) != list(table_columns)
+            )
+
+            # upsert (incremental) entries into existing entries table
+            upsert = sync_state is not None and table_count == 0
+
+            # build replacement of existing table under shadow name
+            shadow = swap and table_exists and not upsert
+
+            direct_write = (append or not table_exists) and not upsert
+
+            if direct_write:
+                target_table_name = table_name
+
+                if recreate and table_exists:
+                    # tear down old table
+                    self.op_drop_table(table_name)
+                    table_exists = False
+            elif shadow:
+                target_table_name = f'{table_name}_shadow'
+
+                # tear down any shadow table left over by a failed load
+                self.execute_sql(f'drop table if exists "{target_table_name}"',
+                                 "dropping any existing shadow table:", target_table_name)
+
+                # (apply primary key once populated)
+                self.op_create_destination_table(target_table_name, table_col_defn, False)
+            else:
+                target_table_name = table_name_tmp
 
-                if not direct_write:
+                self.execute_sql(f'create temp table {table_name_tmp} '
+                                 f'({table_col_defn})',
+                                 "creating temporary table:", table_name_tmp)
+
+            if not table_exists:
+                self.op_create_destination_table(table_name, table_col_defn, table_apply_pk)
+
+            if data_path:
+                self.report("copying file", data_path.name,
+                            "to database table:", target_table_name)
+            else:
+                self.report("streaming to database table:", target_table_name)
+
+            rows = (
+                [parse_value(field_type, record.get(field_name))
+                 for (field_name, field_type) in table_columns]
+                for record in source
+            )
+            type_names = [field_type for (_field_name, field_type) in table_columns]
+
+            chunks = metrics.measure('encode', pgcopy.encode_rows(rows, type_names), unit='bytes')
+
+            with io.BufferedReader(pgcopy.IteratorReader(chunks)) as infile, \
+                    connection.cursor() as cursor, \
+                    metrics.timer('copy') as copy_stage:
+                cursor.copy_expert(
+                    f"copy {target_table_name} from stdin with binary",
+                    infile,
+                )
+
+                copy_stage['rows'] += cursor.rowcount
+                self.report("\tcopied rows:", cursor.rowcount)
+
+            # index entries table, (shadow table prior to its swap)
+            table_indexed_fields = indexed_fields if table_count == 0 else ()
+
+            with metrics.timer('swap'):
+                if shadow:
+                    self.op_swap_table(table_name, target_table_name, table_apply_pk,
+                                       table_indexed_fields)
+                elif not direct_write:
                     try:
                         self.execute_sql('begin')
 
-                        if table_exists:
-                            if recreate:
+                        if upsert:
+                            self.report("upserting into destination table",
+                                        "from temporary table:",
+                                        table_name_tmp, '→', table_name)
+                            self.op_upsert_table(table_name, table_name_tmp, head)
+                        elif table_exists:
+                            if table_recreate:
                                 # tear down old table
                                 self.op_drop_table(table_name)
 
@@ -276,11 +595,12 @@ class Command(BaseCommand):
                                 self.execute_sql(f'truncate table only {table_name}',
                                                  "truncating destination table:", table_name)
 
-                        self.report("(re)-populating destination table",
-                                    "from temporary table:",
-                                    table_name_tmp, '→', table_name)
-                        self.execute_sql(f'insert into {table_name} '
-                                         f'select * from {table_name_tmp}')
+                        if not upsert:
+                            self.report("(re)-populating destination table",
+                                        "from temporary table:",
+                                        table_name_tmp, '→', table_name)
+                            self.execute_sql(f'insert into {table_name} '
+                                             f'select * from {table_name_tmp}')
                     except BaseException:
                         try:
                             self.execute_sql('rollback', 'rolling back transaction')
@@ -291,13 +611,39 @@ class Command(BaseCommand):
                     else:
                         self.execute_sql('commit')
 
+            if not shadow and table_indexed_fields:
+                with metrics.timer('index'):
+                    self.op_index_table(table_name, table_indexed_fields)
+
+                    # gather statistics of indexed expressions
+                    self.execute_sql(f'analyze "{table_name}"',
+                                     'analyzing table:', table_name)
+
+        self.report()
+        self.write_sync_state(table_names[0], form)
+        self.write_catalog(name, int(year), catalog)
+
+        if name == 'reviewer' and apply_suffix and not suffix:
+            self.write_reviewer_directory()
+
     @staticmethod
-    def get_field_sql(field_name):
+    def get_field_type(field_name, field_types):
+        """Infer the column type of the given entry field from the
+        form's field types.
+
+        """
         if re.search(r'^Field\d+$', field_name):
-            field_type = 'citext'
-        else:
-            field_type = 'varchar'
+            return FIELD_COLUMN_TYPES.get(field_types.get(field_name), 'citext')
 
+        return SYSTEM_COLUMN_TYPES.get(field_name, 'character varying')
+
+    @classmethod
+    def get_entry_columns(cls, head, field_types):
+        return [(field_name, cls.get_field_type(field_name, field_types))
+                for field_name in head]
+
+    @staticmethod
+    def get_field_sql(field_name, field_type):
         return f'"{field_name}" {field_type}'
 
     def execute_sql(self, sql, *comments):
@@ -327,9 +673,241 @@ class Command(BaseCommand):
                 'applying primary key to', table_name, self.entity_id_field,
             )
 
+    def op_index_table(self, table_name, indexed_fields, index_table_name=None):
+        """Create lower() expression indexes on the given (role, field ID)
+        columns of the given entries table, (named for the destination
+        table `index_table_name`, if other than the table indexed).
+
+        """
+        for (role, field_id) in indexed_fields:
+            index_name = self.get_index_name(index_table_name or table_name, field_id)
+
+            if index_table_name:
+                index_name = f'{index_name}_shadow'
+
+            self.execute_sql(
+                f'create index if not exists "{index_name}" '
+                f'on "{table_name}" (lower("{field_id}"))',
+                'indexing', table_name, f'({role})', field_id,
+            )
+
+    @staticmethod
+    def get_index_name(table_name, field_id):
+        return f'{table_name}_{field_id}_lower'.lower()
+
+    def op_swap_table(self, table_name, shadow_table_name, apply_pk, indexed_fields=()):
+        """Index and analyze the given populated shadow table, and swap
+        it in for its destination table.
+
+        Readers of the destination table are blocked only for the
+        duration of the (atomic) rename.
+
+        """
+        if apply_pk:
+            self.execute_sql(
+                f'alter table "{shadow_table_name}" '
+                f'add primary key ("{self.entity_id_field}")',
+                'applying primary key to', shadow_table_name, self.entity_id_field,
+            )
+
+        self.op_index_table(shadow_table_name, indexed_fields, table_name)
+
+        self.execute_sql(f'analyze "{shadow_table_name}"',
+                         'analyzing table:', shadow_table_name)
+
+        old_table_name = f'{table_name}_old'
+
+        self.report("swapping shadow table into destination table:",
+                    shadow_table_name, '→', table_name)
+
+        try:
+            self.execute_sql('begin')
+
+            self.execute_sql(f'alter table "{table_name}" rename to "{old_table_name}"')
+            self.execute_sql(f'alter table "{shadow_table_name}" rename to "{table_name}"')
+            self.execute_sql(f'drop table "{old_table_name}"')
+
+            if apply_pk:
+                # free shadow index name for subsequent loads
+                self.execute_sql(f'alter index "{shadow_table_name}_pkey" '
+                                 f'rename to "{table_name}_pkey"')
+
+            for (_role, field_id) in indexed_fields:
+                index_name = self.get_index_name(table_name, field_id)
+                self.execute_sql(f'alter index "{index_name}_shadow" '
+                                 f'rename to "{index_name}"')
+        except BaseException:
+            try:
+                self.execute_sql('rollback', 'rolling back transaction')
+            except BaseException:
+                pass
+
+            raise
+        else:
+            self.execute_sql('commit')
+
+    def op_upsert_table(self, table_name, source_table_name, head):
+        # entries may have been requested more than once (if both created
+        # and updated since last load)
+        update_columns = ', '.join(f'"{field_name}" = excluded."{field_name}"'
+                                   for field_name in head
+                                   if field_name != self.entity_id_field)
+        self.execute_sql(
+            f'insert into {table_name} '
+            f'select distinct on ("{self.entity_id_field}") * from {source_table_name} '
+            f'on conflict ("{self.entity_id_field}") do update set {update_columns}'
+        )
+
+    @staticmethod
+    def get_sync_state(table_name):
+        """Retrieve the high-water marks of the given (existing)
+        entries table.
+
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("select to_regclass(%s)", [table_name])
+            (result,) = cursor.fetchone()
+
+        if not result:
+            return None
+
+        try:
+            return SurveySyncState.objects.get(table_name=table_name)
+        except SurveySyncState.DoesNotExist:
+            return None
+
+    def write_sync_state(self, table_name, form):
+        """Record the high-water marks of the given entries table."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'''\
+                select max("EntryId"::bigint),
+                       max(greatest("DateCreated"::text, "DateUpdated"::text))
+                from "{table_name}"
+            ''')
+            (last_entry_id, last_modified) = cursor.fetchone()
+
+        self.report("recording high-water marks of table:", table_name,
+                    last_entry_id, last_modified or '-', minlevel=3)
+
+        SurveySyncState.objects.update_or_create(
+            table_name=table_name,
+            defaults={
+                'form_hash': form['Hash'],
+                'last_entry_id': last_entry_id,
+                'last_modified': last_modified or '',
+            },
+        )
+
+    def resolve_catalog(self, name, year, head, fields):
+        """Resolve the semantic roles of the form's fields, (as
+        configured by REVIEW_SURVEY_CATALOG).
+
+        Returns a list of pairs of each resolved role and its field,
+        (field_id, field_title).
+
+        """
+        form_fields = [(field_id, field_title) for (field_id, field_title, _field_type) in fields
+                       if field_id and field_id in head]
+        catalog = []
+
+        for field_role in settings.REVIEW_SURVEY_CATALOG.get(name, ()):
+            resolved = field_role.resolve(form_fields)
+
+            if resolved is None:
+                self.warn(f"{name} ({year}): could not resolve field "
+                          f"for role {field_role.role!r} "
+                          f"(default: {field_role.default})")
+                continue
+
+            catalog.append((field_role, resolved))
+
+        return catalog
+
+    def write_catalog(self, name, year, catalog):
+        """Write the given resolved roles of the form's fields to the
+        survey catalog, (see `resolve_catalog`).
+
+        """
+        if not catalog:
+            return
+
+        self.report("writing survey catalog:", name, year)
+
+        with transaction.atomic():
+            for (field_role, (field_id, field_title)) in catalog:
+                if field_id != field_role.default:
+                    self.report(f"\t{field_role.role} → {field_id} ({field_title!r}) "
+                                f"(default: {field_role.default})", minlevel=1)
+                else:
+                    self.report(f"\t{field_role.role} → {field_id}", minlevel=3)
+
+                SurveyFieldRole.objects.update_or_create(
+                    form_name=name,
+                    program_year=year,
+                    role=field_role.role,
+                    defaults={
+                        'field_id': field_id,
+                        'field_title': field_title.strip(),
+                    },
+                )
+
+        SurveyFieldRole.objects.invalidate(name, year)
+
+    def write_reviewer_directory(self):
+        """Refresh the cross-year reviewer directory from the reviewer
+        survey tables.
+
+        """
+        self.report("refreshing reviewer directory")
+        count = ReviewerDirectory.objects.refresh()
+        self.report(f"\t{count} reviewers", minlevel=3)
+
+        if not count:
+            # (the reviewer survey was just loaded with entries)
+            self.warn("reviewer directory is empty following refresh: "
+                      "check the survey catalog's reviewer email field")
+
     def report(self, *contents, minlevel=2):
         if self.verbosity >= minlevel:
-            self.stdout.write(' '.join(str(item) for item in contents))
+            line = ' '.join(str(item) for item in contents)
+            buffer = getattr(self._local, 'buffer', None)
+
+            if buffer is None:
+                self.stdout.write(line)
+            else:
+                buffer.append((self.stdout, line))
+
+    def warn(self, message):
+        line = f'[WARN] {message}'
+        buffer = getattr(self._local, 'buffer', None)
+
+        if buffer is None:
+            self.stderr.write(line)
+        else:
+            buffer.append((self.stderr, line))
+
+    def bind_report(self, func):
+        """Wrap the given function such that, when invoked from another
+        thread, it reports to the calling thread's buffer (if any).
+
+        """
+        buffer = getattr(self._local, 'buffer', None)
+
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            outer = getattr(self._local, 'buffer', None)
+            self._local.buffer = buffer
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.buffer = outer
+
+        return wrapped
+
+    @staticmethod
+    def flush_report(buffer):
+        for (stream, line) in buffer:
+            stream.write(line)
 
     def write_entries_csv(self, head, entries, outfile):
         writer = csv.DictWriter(outfile, tuple(head))
@@ -345,7 +923,7 @@ class Command(BaseCommand):
     def write_fields_csv(self, head, fields, outfile):
         writer = csv.writer(outfile, lineterminator=os.linesep)
         writer.writerow(['field_id', 'field_title'])
-        for (count, (field_id, field_title)) in enumerate(fields, 1):
+        for (count, (field_id, field_title, _field_type)) in enumerate(fields, 1):
             if field_id and field_id in head:
                 writer.writerow([field_id, field_title.strip()])
 
@@ -374,59 +952,144 @@ class Command(BaseCommand):
         return (data_path, field_path)
 
 
-def stream_fields(form):
-    for field in form.fields:
+class LoadMetrics:
+    """Timings, (and counts of rows and of bytes), of the stages of a
+    form's load.
+
+    Timings of stages are exclusive of any stages nested within them,
+    (e.g. the time spent fetching entries from Wufoo as these are
+    streamed to COPY is attributed to "fetch" rather than "copy").
+
+    """
+    def __init__(self):
+        self.stages = {}
+        self._stack = []
 
-        if field.SubFields:
-            for subfield in field.SubFields:
-                yield (subfield.ID, subfield.Label)
+    def stage(self, name):
+        return self.stages.setdefault(name, {'seconds': 0.0, 'rows': 0, 'bytes': 0})
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        stage = self.stage(name)
+        self._stack.append(stage)
+        start = time.perf_counter()
+
+        try:
+            yield stage
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            stage['seconds'] += elapsed
+
+            if self._stack:
+                self._stack[-1]['seconds'] -= elapsed
+
+    def measure(self, name, iterable, unit='rows'):
+        """Generate the items of the given iterable, timing their
+        generation, and counting either the items (rows) or their size
+        (bytes).
+
+        """
+        iterator = iter(iterable)
+
+        while True:
+            with self.timer(name) as stage:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+
+            stage[unit] += 1 if unit == 'rows' else len(item)
+
+            yield item
+
+    def summary(self):
+        return {
+            name: dict(stage, seconds=round(stage['seconds'], 3))
+            for (name, stage) in self.stages.items()
+        }
+
+
+def stream_fields(client, form):
+    """Generate the ID, title and type of each of the given form's
+    fields, (with subfields sharing the type of their parent).
+
+    """
+    for field in client.get_fields(form['Hash']):
+
+        if field.get('SubFields'):
+            for subfield in field['SubFields']:
+                yield (subfield['ID'], subfield['Label'], field['Type'])
 
             continue
 
-        yield (field.ID, field.Title)
+        yield (field['ID'], field['Title'], field['Type'])
+
+
+def read_csv(path):
+    # avoid weird carriage returns inside quoted strings
+    # https://docs.python.org/3/library/csv.html#examples
+    with open(path, newline='') as infile:
+        yield from csv.DictReader(infile)
 
 
 def make_entries_filter(parameters):
-    # factored from pyfoo.Form.search_entries
+    # as in pyfoo.Form.search_entries
     return urlencode([
         (f'Filter{count}', f'{param.field}__{param.operator}__{param.value}')
         for (count, param) in enumerate(parameters, 1)
     ]).replace('__', '+')
 
 
-def stream_entries(form, completed=True, page_size=ENTRY_PAGE_SIZE):
+def stream_entries(client, form, completed=True, page_size=ENTRY_PAGE_SIZE, since=None):
     """Generate form entries from given Form.
 
-    Wraps `get_entries` to handle pagination.
+    Wraps `Client.stream_entries` to handle pagination, (with pages
+    requested concurrently and generated in order).
+
+    If the high-water marks of a previous load are given (`since`), only
+    entries created or updated since are generated; (and entries both
+    created and updated since may be generated twice).
 
     """
-    filter_string = make_entries_filter([ENTRY_FILTER_COMPLETE]) if completed else None
+    parameters = [ENTRY_FILTER_COMPLETE] if completed else []
+
+    if since is None:
+        parameter_sets = [parameters]
+    else:
+        parameter_sets = [
+            parameters + [SearchParameter('EntryId', 'Is_greater_than', since.last_entry_id or 0)],
+        ]
+        if since.last_modified:
+            parameter_sets.append(
+                parameters + [SearchParameter('DateUpdated', 'Is_after', since.last_modified)]
+            )
+
+    for parameter_set in parameter_sets:
+        filter_string = make_entries_filter(parameter_set) if parameter_set else None
+        yield from client.stream_entries(form['Hash'], page_size, filter_string=filter_string)
+
 
-    for page_start in itertools.count(step=page_size):
-        entries = form.get_entries(page_start, page_size, filter_string=filter_string)
-        yield from entries
+def peek_entries(entries):
+    """Retrieve the first of the given entries, (if any), together
+    with an equivalent stream of all entries.
+
+    """
+    try:
+        head = next(entries)
+    except StopIteration:
+        return (None, entries)
 
-        if len(entries) < page_size:
-            break
+    return (head, itertools.chain((head,), entries))
 
 
-def stream_forms(client, filters=(), name_expressions=FORMS):
+def stream_forms(client, filters=(), name_expressions=wufoo.FORMS):
     """Generate forms whose names match regular expression(s)."""
-    for form in client.forms:
-        for name_expression in name_expressions:
-            match = re.search(name_expression, form.Name, re.I)
-
-            if match:
-                # Form is a candidate
-                if all(re.search(filter_, form.Name, re.I) for filter_ in filters):
-                    # This is our form!
-                    (year, *names) = match.groups()
-                    name = '_'.join(names).lower()
-                    assert name, (
-                        "Failed to capture form name from identifying regular "
-                        f"expression {name_expression!r}"
-                    )
-                    yield (year, name, form)
-
-                # No need to continue with this form
-                break
+    for form in client.get_forms():
+        match = wufoo.match_form(form['Name'], name_expressions)
+
+        # Form is a candidate
+        if match and all(re.search(filter_, form['Name'], re.I) for filter_ in filters):
+            # This is our form!
+            (year, name) = match
+            yield (year, name, form)
@@ -4,12 +4,13 @@ import enum
 import re
 
 from django.conf import settings
-from django.db import connection, ProgrammingError
+from django.db import connection, transaction
 from django.db.models.functions import Now
 from terminaltables import AsciiTable
 
-from review.models import InterviewAssignment
+from review.models import InterviewAssignment, ReviewerDirectory
 
+from . import applicant_survey_fields
 from .base import ApplicationEmailCommand, split_every
 
 
@@ -101,6 +102,7 @@ class EmailTemplate(str, enum.Enum):
 class Command(ApplicationEmailCommand):
 
     def add_arguments(self, parser):
+        super().add_arguments(parser)
         parser.add_argument(
             '--round',
             dest='interview_round',
@@ -125,46 +127,50 @@ class Command(ApplicationEmailCommand):
                  "First Last <email@domain.com>",
         )
 
-    def get_all_reviewers(self):
-        with connection.cursor() as cursor:
-            cursor.execute(f'''\
-                select "Field1" as first_name,
-                       "Field2" as last_name,
-                       "Field3" as email,
-                       "Field4" as association
-                from survey_reviewer_{settings.REVIEW_PROGRAM_YEAR}
-            ''')
+    def get_applicants(self, application_ids):
+        """Map the given applications to their applicants, as identified
+        by the first pages of their application surveys.
 
-            for row in cursor:
-                yield Interviewer(*row)
+        """
+        table_name = f'survey_application_1_{settings.REVIEW_PROGRAM_YEAR}'
 
-    def search_reviewer(self, email, start=None, stop=2017):
-        if start is None:
-            start = settings.REVIEW_PROGRAM_YEAR - 1
+        # applicant's vital data come first
+        select_fields = ', '.join(
+            f'survey_1."{field_name}"::text'
+            for (_label, field_name) in applicant_survey_fields()[:3]
+        )
 
         with connection.cursor() as cursor:
-            for year in range(start, stop, -1):
-                try:
-                    cursor.execute(f'''\
-                        select "Field1" as first_name,
-                               "Field2" as last_name,
-                               "Field3" as email,
-                               "Field4" as association
-                        from survey_reviewer_{year}
-                        where "Field3" ilike %s
-                    ''', [email])
-                except ProgrammingError:
-                    # should be that table for this year does not exist
-                    continue
-
-                try:
-                    row = next(iter(cursor))
-                except StopIteration:
-                    pass
-                else:
-                    return Interviewer(*row)
+            cursor.execute(
+                f'''\
+                    select page.application_id, {select_fields}
+                    from application_page page
+                    join "{table_name}" survey_1 on (survey_1."EntryId" = page.entity_code)
+                    where page.table_name = %s and
+                          page.column_name = 'EntryId' and
+                          page.application_id = any(%s)
+                ''',
+                [table_name, list(application_ids)],
+            )
 
-        raise LookupError(email)
+            return {application_id: Recipient(*applicant_info)
+                    for (application_id, *applicant_info) in cursor}
+
+    def get_interviewers(self, emails):
+        """Map the given email addresses (by lower-case) to interviewers,
+        as most recently registered via the reviewer surveys of any year,
+        (per the reviewer directory).
+
+        """
+        return {
+            email_lower: Interviewer(
+                first_name=entry.first_name,
+                last_name=entry.last_name,
+                email=entry.email,
+                association=entry.association,
+            )
+            for (email_lower, entry) in ReviewerDirectory.objects.get_by_emails(emails).items()
+        }
 
     def get_recipients(self, interview_round=None):
         assignments_queryset = InterviewAssignment.objects.current_year().filter(notified=None)
@@ -172,49 +178,40 @@ class Command(ApplicationEmailCommand):
         if interview_round is not None:
             assignments_queryset = assignments_queryset.filter(interview_round=interview_round)
 
-        all_reviewers = {
-            reviewer.email.lower(): reviewer
-            for reviewer in self.get_all_reviewers()
-        }
+        assignments = list(assignments_queryset.select_related('reviewer'))
+
+        # FIXME: applicant only has email address, and application is just a link
+        # FIXME: to survey data; so retrieve full applicant info from survey data
+        applicants = self.get_applicants({assignment.application_id for assignment in assignments})
+
+        # Reviewer records' names aren't reliably filled in, (nor do these
+        # record association); so, look up interviewers -- all at once -- in
+        # the reviewer directory, (their latest registrations of any year, as
+        # refreshed by loadwufoo)
+        interviewers = self.get_interviewers(assignment.reviewer.email for assignment in assignments)
+
+        for assignment in assignments:
+            try:
+                applicant = applicants[assignment.application_id]
+            except KeyError:
+                self.stderr.write(
+                    f'[WARN] ignoring assignment {assignment.pk} '
+                    f'to application without survey data: {assignment.application_id}'
+                )
+                continue
 
-        for assignment in (
-            assignments_queryset.select_related('application__applicant', 'reviewer').iterator()
-        ):
-            # FIXME: applicant only has email address, and application is just a link
-            # FIXME: to survey data; so retrieve full applicant info from survey data
-            survey0 = assignment.application.applicationpage_set.all()[0]
-
-            # survey field names are reused; depends on the fact that applicant's
-            # vital data come first:
-            applicant_info = [survey0.entry.getlist(field)[0]
-                              for field in ('First', 'Last', 'Email')]
-
-            # FIXME: loadapps doesn't fill in reviewer name, and so this isn't
-            # FIXME: reliably filled in.
-            #
-            # FIXME: moreover, we don't load reviewer history from the survey at all.
-            # FIXME: (since this may change over time, perhaps could be thrown
-            # FIXME: onto the ReviewerConcession?)
-            #
-            # We'll preload these for efficiency (reviewer.email + get_all_reviewers) ...
             interviewer_email = assignment.reviewer.email
             try:
-                interviewer = all_reviewers[interviewer_email.lower()]
+                interviewer = interviewers[interviewer_email.lower()]
             except KeyError:
-                # ... and then do a search through previous surveys to fill in gaps
-                try:
-                    interviewer = self.search_reviewer(interviewer_email)
-                except LookupError:
-                    self.stderr.write(
-                        f'[WARN] ignoring assignment {assignment.pk} '
-                        f'to unregistered reviewer: {interviewer_email}'
-                    )
-                    continue
-                else:
-                    all_reviewers[interviewer_email.lower()] = interviewer
+                self.stderr.write(
+                    f'[WARN] ignoring assignment {assignment.pk} '
+                    f'to unregistered reviewer: {interviewer_email}'
+                )
+                continue
 
             yield (
-                Recipient(*applicant_info),
+                applicant,
                 interviewer,
                 assignment.interview_round,
                 assignment,
@@ -230,50 +227,56 @@ class Command(ApplicationEmailCommand):
                 None,
             )
 
-    def send_recipients(self, recipient_stream, batch_size=30):
-        total_sent = total_recorded = 0
+    def send_recipients(self, recipient_stream, enqueue_only, cycle, batch_size=30):
+        total_enqueued = total_recorded = 0
 
-        # must batch these to avoid email sending API limits
+        self.stdout.write(f'[INFO] send cycle {cycle}')
+
+        # enqueue messages and record assignments notified together, in batches
         for recipients in split_every(recipient_stream, batch_size):
-            try:
-                send_count = self.send_mass_mail(
+            with transaction.atomic():
+                enqueue_count = self.enqueue_mail(
                     (
-                        EmailTemplate.for_round(interview_round),               # email template
-                        applicant.email,                                        # to: address
-                        {                                                       # template context
-                            'applicant': applicant,
-                            'interviewer': reviewer,
-                            'program_year': settings.REVIEW_PROGRAM_YEAR,
-                            'round_ordinal': round_ordinal(interview_round),
-                            'previous_round_ordinal': (
-                                round_ordinal(interview_round - 1) if interview_round > 1 else None
-                            ),
-                        },
-                        (                                                       # cc: addresses
-                            reviewer.email,
-                        ) + settings.INTERVIEW_CC_EMAIL,
-                    )
-                    for (applicant, reviewer, interview_round) in igetitems(recipients, slice(3))
+                        (
+                            EmailTemplate.for_round(interview_round).value,         # email template
+                            applicant.email,                                        # to: address
+                            {                                                       # template context
+                                'applicant': applicant,
+                                'interviewer': reviewer,
+                                'program_year': settings.REVIEW_PROGRAM_YEAR,
+                                'round_ordinal': round_ordinal(interview_round),
+                                'previous_round_ordinal': (
+                                    round_ordinal(interview_round - 1) if interview_round > 1 else None
+                                ),
+                            },
+                            (                                                       # cc: addresses
+                                reviewer.email,
+                            ) + settings.INTERVIEW_CC_EMAIL,
+                        )
+                        for (applicant, reviewer, interview_round) in igetitems(recipients, slice(3))
+                    ),
+                    cycle,
                 )
-            except Exception:
-                failed_emails = (applicant.email for applicant in igetitems(recipients, 0))
-                self.stderr.write('[FATAL] send to: ' + ' '.join(failed_emails))
-                raise
 
-            total_sent += send_count
-            self.stdout.write(f'[INFO] sent {send_count}')
+                pks_notified = [assignment.pk for assignment in igetitems(recipients, 3) if assignment]
+                if pks_notified:
+                    assignments_notified = InterviewAssignment.objects.filter(pk__in=pks_notified)
+                    update_count = assignments_notified.update(notified=Now())
+                else:
+                    update_count = 0
 
-            pks_notified = [assignment.pk for assignment in igetitems(recipients, 3) if assignment]
-            if pks_notified:
-                assignments_notified = InterviewAssignment.objects.filter(pk__in=pks_notified)
-                update_count = assignments_notified.update(notified=Now())
-            else:
-                update_count = 0
+            total_enqueued += enqueue_count
+            self.stdout.write(f'[INFO] enqueued {enqueue_count}')
 
             total_recorded += update_count
             self.stdout.write(f'[INFO] recorded {update_count}')
 
-        self.stdout.write(f'[INFO] totals: sent {total_sent} and recorded {total_recorded}')
+        self.stdout.write(f'[INFO] totals: enqueued {total_enqueued} and recorded {total_recorded}')
+
+        if not enqueue_only:
+            counts = self.drain_outbox()
+            self.stdout.write(f"[INFO] sent {counts['sent']}")
+
         self.stdout.write('[INFO] done')
 
     def report_recipients(self, recipient_stream):
@@ -290,13 +293,14 @@ class Command(ApplicationEmailCommand):
         )
         self.stdout.write(table.table)
 
-    def handle(self, interview_round, send_mail, test_recipients, **options):
+    def handle(self, interview_round, send_mail, test_recipients, enqueue_only, cycle, **options):
         if test_recipients:
             recipients = self.get_test_recipients(test_recipients, interview_round)
         else:
             recipients = self.get_recipients(interview_round)
 
         if send_mail:
-            self.send_recipients(recipients)
+            self.send_recipients(recipients, enqueue_only,
+                                 self.resolve_cycle(cycle, bool(test_recipients)))
         else:
             self.report_recipients(recipients)
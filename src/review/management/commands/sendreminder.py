@@ -8,13 +8,13 @@ from django.core.validators import validate_email
 from django.db import connection
 from django.utils.safestring import mark_safe
 
-from . import APPLICANT_SURVEY_FIELDS, REFERENCE_FORM_URL
-from .base import ApplicationEmailCommand, exhaust_iterable
+from . import REFERENCE_FORM_URL, SurveyFieldRole, applicant_survey_fields, form_url_field
+from .base import ApplicationEmailCommand, DailyCycleMixin, exhaust_iterable
 
 
 APPLICATION_FORM2_URL = ('https://datascience.wufoo.com/forms/'
                          f'{settings.REVIEW_PROGRAM_YEAR}-dssg-fellowship-application-part-2/'
-                         'def/field461={app_email}')
+                         'def/{app_email_field}={app_email}')
 
 EMAIL_RECIPIENT_PATTERN = re.compile(r'([^ <>]+) +([^ <>]+) *<([^>]+)>')
 
@@ -30,11 +30,12 @@ def valid_datetime(value):
     raise argparse.ArgumentTypeError(f"Invalid date: '{value}'.")
 
 
-class Command(ApplicationEmailCommand):
+class Command(DailyCycleMixin, ApplicationEmailCommand):
 
     help = "Send reminder emails to applicants or to applicants' references"
 
     def add_arguments(self, parser):
+        super().add_arguments(parser)
         parser.add_argument(
             '--test',
             action='append',
@@ -85,7 +86,7 @@ class Command(ApplicationEmailCommand):
                  "database-compatible timestamp (e.g.: 2004-10-19T10:23:54)",
         )
 
-    def handle(self, target, template, test, dry_run, verbosity, since=None, **_options):
+    def handle(self, target, template, test, dry_run, enqueue_only, cycle, verbosity, since=None, **_options):
         data_handler = getattr(self, f'stream_{target}s')
 
         to_mail = data_handler(since=since, test=test)
@@ -95,10 +96,20 @@ class Command(ApplicationEmailCommand):
         if dry_run:
             exhaust_iterable(messages)
         else:
-            send_count = self.send_batched_mail(messages)
-            self.stderr.write(f'I: sent {send_count}')
+            cycle = self.resolve_cycle(cycle, bool(test))
+            self.stderr.write(f'I: send cycle {cycle}')
+
+            enqueue_count = self.enqueue_mail(messages, cycle)
+            self.stderr.write(f'I: enqueued {enqueue_count}')
+
+            if not enqueue_only:
+                counts = self.drain_outbox()
+                self.stderr.write(f"I: sent {counts['sent']}")
 
     def process_mail(self, to_mail, target, template, dry_run, verbosity):
+        application_form_field = form_url_field('application_2')
+        reference_form_field = form_url_field('recommendation')
+
         for ((app_first, app_last, app_email), reminder_targets) in to_mail:
             if not app_first or not app_last or not app_email:
                 self.stderr.write("W: skipping malformed applicant "
@@ -114,8 +125,14 @@ class Command(ApplicationEmailCommand):
                 if target == 'reference':
                     self.stdout.write(f"    {action}: " + ' and '.join(ref[2] for ref in reminder_targets))
 
-            application_link = mark_safe(APPLICATION_FORM2_URL.format(app_email=app_email))
-            reference_link = mark_safe(REFERENCE_FORM_URL.format(app_email=app_email))
+            application_link = mark_safe(APPLICATION_FORM2_URL.format(
+                app_email_field=application_form_field,
+                app_email=app_email,
+            ))
+            reference_link = mark_safe(REFERENCE_FORM_URL.format(
+                app_email_field=reference_form_field,
+                app_email=app_email,
+            ))
 
             for (target_first, target_last, target_email) in reminder_targets:
                 if not target_last or not target_email:
@@ -167,29 +184,34 @@ class Command(ApplicationEmailCommand):
 
             return
 
+        applicant_fields = applicant_survey_fields()
+
         select_fields = ', '.join(
             f'survey_1."{field_name}" AS {label}'
-            for (label, field_name) in APPLICANT_SURVEY_FIELDS[:3]
+            for (label, field_name) in applicant_fields[:3]
         )
         assert select_fields
 
-        (join_label, join_field) = APPLICANT_SURVEY_FIELDS[2]
+        (join_label, join_field) = applicant_fields[2]
         assert join_label == 'app_email'
 
+        join_field2 = SurveyFieldRole.objects.field_id('application_2', 'app_email')
+
         with connection.cursor() as cursor:
             # query info of applicants who are in part-1 but not part-2 of the survey
             cursor.execute(f"""\
                 SELECT {select_fields}
                 FROM survey_application_1_{settings.REVIEW_PROGRAM_YEAR} AS survey_1
-                LEFT OUTER JOIN survey_application_2_{settings.REVIEW_PROGRAM_YEAR} AS survey_2
-                USING ("{join_field}")
+                LEFT OUTER JOIN survey_application_2_{settings.REVIEW_PROGRAM_YEAR} AS survey_2 ON (
+                    survey_1."{join_field}" = survey_2."{join_field2}"
+                )
                 LEFT OUTER JOIN application_page page ON (
                     page.table_name = 'survey_application_1_{settings.REVIEW_PROGRAM_YEAR}' AND
                     page.column_name = 'EntryId' AND
                     page.entity_code = survey_1."EntryId"
                 )
                 LEFT OUTER JOIN application USING (application_id)
-                WHERE survey_2."{join_field}" IS NULL AND
+                WHERE survey_2."{join_field2}" IS NULL AND
                       application.withdrawn IS NULL
             """)
             for row in cursor:
@@ -215,7 +237,7 @@ class Command(ApplicationEmailCommand):
 
         select_fields = ', '.join(
             f'survey_1."{field_name}" AS {label}'
-            for (label, field_name) in APPLICANT_SURVEY_FIELDS
+            for (label, field_name) in applicant_survey_fields()
         )
         assert select_fields
 
@@ -232,7 +254,7 @@ class Command(ApplicationEmailCommand):
         """
         if since is not None:
             statement += f"""\
-                AND CAST(survey_1."DateCreated" as timestamp) > %s
+                AND nullif(survey_1."DateCreated"::text, '')::timestamp > %s::timestamp
             """
 
         with connection.cursor() as cursor:
@@ -1,24 +1,33 @@
+import functools
 import itertools
+import operator
 import urllib
 from collections import defaultdict, namedtuple
 
 from django.conf import settings
 from django.core.management.base import CommandError
-from django.db import connection, IntegrityError
+from django.db import transaction, IntegrityError
+from django.db.models import Q
 from django.utils.safestring import mark_safe
 
 from review import models
 
-from . import APPLICANT_SURVEY_FIELDS, REFERENCE_SURVEY_FIELDS, REFERENCE_FORM_URL
-from .base import ApplicationEmailCommand, exhaust_iterable
+from . import (
+    APPLICANT_SURVEY_ROLES,
+    REFERENCE_FORM_URL,
+    form_url_field,
+)
+from .base import ApplicationEmailCommand, DailyCycleMixin, exhaust_iterable
 
 
-class Command(ApplicationEmailCommand):
+class Command(DailyCycleMixin, ApplicationEmailCommand):
 
     help = ("Send final status emails to applicants and "
-            "reminders to unsubmitted references")
+            "reminders to unsubmitted references "
+            "(per the application statuses maintained by loadapps)")
 
     def add_arguments(self, parser):
+        super().add_arguments(parser)
         parser.add_argument(
             '--dry-run',
             action='store_false',
@@ -36,7 +45,7 @@ class Command(ApplicationEmailCommand):
         parser.add_argument(
             '--debug-sql',
             action='store_true',
-            help="print underlying SQL statement",
+            help="print underlying SQL query",
         )
 
         parser.add_argument(
@@ -104,14 +113,10 @@ class Command(ApplicationEmailCommand):
 
     def handle(self, opt_incomplete, opt_unsubmitted, opt_submitted, opt_complete,
                opt_references, opt_references_complete, opt_references_template,
-               send_mail, test_emails, debug_sql, verbosity, **_opts):
+               send_mail, test_emails, debug_sql, enqueue_only, cycle, verbosity, **_opts):
         self._create_cache = defaultdict(list)
         self._verbosity = verbosity
 
-        if debug_sql:
-            print(sql_statement())
-            return
-
         if opt_incomplete:
             # This was intended largely for them; but, Rayid handled these, this year
             raise NotImplementedError
@@ -120,7 +125,14 @@ class Command(ApplicationEmailCommand):
             not opt_complete and not opt_references):
             raise CommandError("nothing to do")
 
-        application_statuses = stream_test(test_emails) if test_emails else stream_applications()
+        statuses = query_applications(opt_unsubmitted, opt_submitted, opt_complete,
+                                      opt_references, opt_references_complete)
+
+        if debug_sql:
+            print(statuses.query)
+            return
+
+        application_statuses = stream_test(test_emails) if test_emails else stream_applications(statuses)
 
         to_mail = self.generate_mail(application_statuses,
                                      opt_incomplete, opt_unsubmitted,
@@ -131,21 +143,37 @@ class Command(ApplicationEmailCommand):
         messages = self.process_mail(to_mail, send_mail=send_mail)
 
         if send_mail:
-            send_count = self.send_batched_mail(messages)
-            self.stderr.write(f'I: sent {send_count}')
-
-            for (model, objs) in self._create_cache.items():
-                if objs:
-                    try:
-                        model.objects.bulk_create(objs, ignore_conflicts=True)
-                    except IntegrityError as exc:
-                        batch_ids = [obj.application_id for obj in objs]
-                        self.stderr.write(
-                            f'E: integrity error affecting batch {model.__name__} '
-                            f'application_id={batch_ids}: {exc}'
-                        )
-                    else:
-                        self.stderr.write(f'I: inserted {len(objs)} ({model._meta.db_table})')
+            cycle = self.resolve_cycle(cycle, bool(test_emails))
+            self.stderr.write(f'I: send cycle {cycle}')
+
+            # record messages as they're enqueued: the outbox will send them
+            with transaction.atomic():
+                enqueue_count = self.enqueue_mail(messages, cycle)
+                self.stderr.write(f'I: enqueued {enqueue_count}')
+
+                for (model, objs) in self._create_cache.items():
+                    if objs:
+                        try:
+                            with transaction.atomic():
+                                model.objects.bulk_create(objs, ignore_conflicts=True)
+                        except IntegrityError as exc:
+                            batch_ids = [obj.application_id for obj in objs]
+                            self.stderr.write(
+                                f'E: integrity error affecting batch {model.__name__} '
+                                f'application_id={batch_ids}: {exc}'
+                            )
+                        else:
+                            self.stderr.write(f'I: inserted {len(objs)} ({model._meta.db_table})')
+
+                            if model is models.ApplicationCompleteMessage:
+                                # (until loadapps next refreshes these)
+                                models.ApplicationStatus.objects.mark_complete_sent(
+                                    [obj.application_id for obj in objs]
+                                )
+
+            if not enqueue_only:
+                counts = self.drain_outbox()
+                self.stderr.write(f"I: sent {counts['sent']}")
         else:
             exhaust_iterable(messages)
 
@@ -183,6 +211,8 @@ class Command(ApplicationEmailCommand):
                       opt_submitted, opt_complete,
                       opt_references, opt_references_complete,
                       opt_references_template):
+        reference_form_field = form_url_field('recommendation')
+
         for status in application_statuses:
             if not status.app_completed:
                 if opt_incomplete:
@@ -193,6 +223,7 @@ class Command(ApplicationEmailCommand):
                     continue
 
             reference_link = REFERENCE_FORM_URL.format(
+                app_email_field=reference_form_field,
                 app_email=urllib.parse.quote_plus(status.app_email),
             )
             references_submitted = (status.ref0_submitted, status.ref1_submitted)
@@ -268,81 +299,10 @@ class Command(ApplicationEmailCommand):
                     )
 
 
-def sql_statement():
-    select_fields = ', '.join(
-        f'survey_1."{field_name}" AS {label}'
-        for (label, field_name) in APPLICANT_SURVEY_FIELDS
-    )
-    assert select_fields
-
-    applicant_fields = dict(APPLICANT_SURVEY_FIELDS)
-    reference_fields = dict(REFERENCE_SURVEY_FIELDS)
-
-    ref_first = reference_fields['ref_first']
-    ref_last = reference_fields['ref_last']
-    ref_email = reference_fields['ref_email']
-    app_email = applicant_fields['app_email']
-    ref0_email = applicant_fields['ref0_email']
-    ref1_email = applicant_fields['ref1_email']
-
-    return f"""\
-        WITH application_status AS (
-                SELECT DISTINCT page.application_id, {select_fields}, (
-                    CASE WHEN survey_2."{app_email}" IS NULL THEN false ELSE true END
-                ) as app_completed, (
-                    CASE WHEN rec_j0."{ref_email}" IS NULL THEN false ELSE true END
-                ) as ref0_submitted, (
-                    CASE WHEN rec_j1."{ref_email}" IS NULL THEN false ELSE true END
-                ) as ref1_submitted, (
-                    CASE WHEN email_complete.email_message_id IS NULL THEN false ELSE true END
-                ) as email_complete_sent
-                FROM survey_application_1_{settings.REVIEW_PROGRAM_YEAR} AS survey_1
-                LEFT OUTER JOIN survey_application_2_{settings.REVIEW_PROGRAM_YEAR} AS survey_2 ON(
-                    LOWER(survey_1."{app_email}") = LOWER(survey_2."{app_email}")
-                )
-                LEFT OUTER JOIN survey_recommendation_{settings.REVIEW_PROGRAM_YEAR} AS rec_j0 ON (
-                    LOWER(survey_1."{ref0_email}") = LOWER(rec_j0."{ref_email}") AND
-                    LOWER(survey_1."{app_email}") = LOWER(rec_j0."{app_email}")
-                )
-                LEFT OUTER JOIN survey_recommendation_{settings.REVIEW_PROGRAM_YEAR} rec_j1 ON (
-                    LOWER(survey_1."{ref1_email}") = LOWER(rec_j1."{ref_email}") AND
-                    LOWER(survey_1."{app_email}") = LOWER(rec_j1."{app_email}")
-                )
-                LEFT OUTER JOIN application_page page ON (
-                    page.table_name = 'survey_application_1_{settings.REVIEW_PROGRAM_YEAR}' AND
-                    page.column_name = 'EntryId' AND
-                    page.entity_code = survey_1."EntryId"
-                )
-                LEFT OUTER JOIN application USING (application_id)
-                LEFT OUTER JOIN email_message_application_complete email_complete USING (application_id)
-                WHERE withdrawn IS NULL
-            ),
-            application_reference AS (
-                SELECT DISTINCT ON (LOWER("{app_email}"), LOWER("{ref_email}"))
-                       "{app_email}" AS app_email, "{ref_email}" AS ref_email,
-                       "{ref_first}" AS ref_first, "{ref_last}" AS ref_last
-                FROM survey_recommendation_{settings.REVIEW_PROGRAM_YEAR}
-            ),
-            reference_aggregate AS (
-                SELECT LOWER(app_email) AS app_email,
-                       ARRAY_AGG(ARRAY[ref_first, ref_last, ref_email]) AS references
-                FROM application_reference
-                GROUP BY 1
-            )
-
-        SELECT application_status.*,
-               COALESCE(reference_aggregate.references, ARRAY[]::TEXT[]) as references
-        FROM application_status
-        LEFT OUTER JOIN reference_aggregate ON (
-            LOWER(application_status.app_email) = LOWER(reference_aggregate.app_email)
-        )
-    """
-
-
 ApplicationStatus = namedtuple(
     'ApplicationStatus',
     ['application_id'] +
-    [label for (label, _col_name) in APPLICANT_SURVEY_FIELDS] +
+    list(APPLICANT_SURVEY_ROLES) +
     [
         'app_completed',
         'ref0_submitted',
@@ -353,12 +313,47 @@ ApplicationStatus = namedtuple(
 )
 
 
-def stream_applications():
-    statement = sql_statement()
-    with connection.cursor() as cursor:
-        cursor.execute(statement)
-        for row in cursor:
-            yield ApplicationStatus._make(row)
+def query_applications(opt_unsubmitted, opt_submitted, opt_complete,
+                       opt_references, opt_references_complete):
+    """Query the statuses (as maintained by loadapps) of this year's
+    applications, for which the given options might send mail.
+
+    """
+    conditions = []
+
+    if opt_references:
+        references_condition = Q(ref0_submitted=False) | Q(ref1_submitted=False)
+        if opt_references_complete:
+            references_condition &= Q(app_completed=True)
+        conditions.append(references_condition)
+
+    if opt_unsubmitted:
+        conditions.append(Q(app_completed=True, reference_count__lt=2))
+
+    if opt_submitted:
+        conditions.append(Q(app_completed=True, email_complete_sent=False, reference_count__gte=2))
+
+    if opt_complete:
+        conditions.append(Q(app_completed=True))
+
+    return models.ApplicationStatus.objects.filter(
+        functools.reduce(operator.or_, conditions),
+        program_year=settings.REVIEW_PROGRAM_YEAR,
+        application__withdrawn=None,
+    ).order_by('application_id').values_list(
+        'application_id',
+        *APPLICANT_SURVEY_ROLES,
+        'app_completed',
+        'ref0_submitted',
+        'ref1_submitted',
+        'email_complete_sent',
+        'submitted_references',
+    )
+
+
+def stream_applications(statuses):
+    for row in statuses.iterator():
+        yield ApplicationStatus._make(row)
 
 
 def stream_test(emails):
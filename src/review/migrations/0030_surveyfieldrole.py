@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0028_applications_completed_function'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyFieldRole',
+            fields=[
+                ('survey_field_role_id', models.AutoField(primary_key=True, serialize=False)),
+                ('form_name', models.CharField(max_length=100)),
+                ('program_year', models.IntegerField()),
+                ('role', models.CharField(max_length=100)),
+                ('field_id', models.CharField(max_length=100)),
+                ('field_title', models.TextField(blank=True)),
+                ('resolved', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'survey_catalog',
+                'ordering': ('-program_year', 'form_name', 'role'),
+                'unique_together': {('form_name', 'program_year', 'role')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0030_surveyfieldrole'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveySyncState',
+            fields=[
+                ('table_name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('form_hash', models.CharField(max_length=100)),
+                ('last_entry_id', models.BigIntegerField(null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=30)),
+                ('synced', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'survey_sync_state',
+                'ordering': ('table_name',),
+            },
+        ),
+    ]
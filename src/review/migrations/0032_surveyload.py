@@ -0,0 +1,30 @@
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0031_surveysyncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyLoad',
+            fields=[
+                ('survey_load_id', models.AutoField(primary_key=True, serialize=False)),
+                ('form_name', models.CharField(max_length=100)),
+                ('program_year', models.IntegerField()),
+                ('started', models.DateTimeField()),
+                ('finished', models.DateTimeField()),
+                ('succeeded', models.BooleanField()),
+                ('entries', models.IntegerField()),
+                ('stages', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+            ],
+            options={
+                'db_table': 'survey_load',
+                'ordering': ('-finished',),
+                'get_latest_by': 'finished',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0032_surveyload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyLinkState',
+            fields=[
+                ('table_name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('last_entry_id', models.BigIntegerField(null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=30)),
+                ('linked', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'survey_link_state',
+                'ordering': ('table_name',),
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+INDEX_NAME = 'account_emailaddress_email_lower'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_email_max_length'),
+        ('review', '0033_surveylinkstate'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"""CREATE INDEX IF NOT EXISTS {INDEX_NAME}
+                ON account_emailaddress (lower(email))""",
+            f"""DROP INDEX IF EXISTS {INDEX_NAME}""",
+        ),
+    ]
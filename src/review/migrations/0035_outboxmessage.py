@@ -0,0 +1,37 @@
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0034_emailaddress_email_lower'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('outbox_message_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('idempotency_key', models.CharField(max_length=64, unique=True)),
+                ('template', models.CharField(max_length=200)),
+                ('recipients', models.TextField()),
+                ('message', django.contrib.postgres.fields.jsonb.JSONField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('available', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('sent', models.DateTimeField(db_index=True, null=True)),
+                ('failed', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'email_outbox',
+                'ordering': ('outbox_message_id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(condition=models.Q(failed=None, sent=None), fields=['available'], name='email_outbox_pending'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+INDEX_NAME = 'reviewer_directory_email_lower'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0035_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewerDirectory',
+            fields=[
+                ('reviewer_directory_id', models.AutoField(primary_key=True, serialize=False)),
+                ('email', models.CharField(max_length=254)),
+                ('first_name', models.TextField(blank=True)),
+                ('last_name', models.TextField(blank=True)),
+                ('association', models.TextField(blank=True)),
+                ('program_year', models.IntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'reviewer directory',
+                'db_table': 'reviewer_directory',
+                'ordering': ('email',),
+            },
+        ),
+        migrations.RunSQL(
+            f"""CREATE UNIQUE INDEX {INDEX_NAME}
+                ON reviewer_directory (lower(email))""",
+            f"""DROP INDEX IF EXISTS {INDEX_NAME}""",
+        ),
+    ]
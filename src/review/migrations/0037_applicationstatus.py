@@ -0,0 +1,44 @@
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0036_reviewerdirectory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationStatus',
+            fields=[
+                ('application', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='status', serialize=False, to='review.Application')),
+                ('program_year', models.IntegerField()),
+                ('app_first', models.TextField(blank=True)),
+                ('app_last', models.TextField(blank=True)),
+                ('app_email', models.TextField(blank=True)),
+                ('ref0_first', models.TextField(blank=True)),
+                ('ref0_last', models.TextField(blank=True)),
+                ('ref0_email', models.TextField(blank=True)),
+                ('ref1_first', models.TextField(blank=True)),
+                ('ref1_last', models.TextField(blank=True)),
+                ('ref1_email', models.TextField(blank=True)),
+                ('app_completed', models.BooleanField(default=False)),
+                ('ref0_submitted', models.BooleanField(default=False)),
+                ('ref1_submitted', models.BooleanField(default=False)),
+                ('email_complete_sent', models.BooleanField(default=False)),
+                ('submitted_references', django.contrib.postgres.fields.jsonb.JSONField(default=list)),
+                ('reference_count', models.PositiveSmallIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'application statuses',
+                'db_table': 'application_status',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='applicationstatus',
+            index=models.Index(fields=['program_year', 'app_completed', 'email_complete_sent'], name='application_status_flags'),
+        ),
+    ]
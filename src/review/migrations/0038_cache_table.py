@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+# table of the shared cache (see settings.CACHES and review.localcache),
+# as would be created by command createcachetable
+TABLE_NAME = 'review_cache'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review', '0037_applicationstatus'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                f"""CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+                        cache_key varchar(255) NOT NULL PRIMARY KEY,
+                        value text NOT NULL,
+                        expires timestamp with time zone NOT NULL
+                    )""",
+                f"""CREATE INDEX IF NOT EXISTS {TABLE_NAME}_expires
+                    ON {TABLE_NAME} (expires)""",
+            ],
+            f"""DROP TABLE IF EXISTS {TABLE_NAME}""",
+        ),
+    ]
@@ -1,4 +1,5 @@
 import collections
+import datetime
 import enum
 import re
 
@@ -6,14 +7,19 @@ from django.conf import settings
 from django.contrib import auth
 from django.contrib.auth import models as auth_models
 from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
-from django.contrib.postgres.fields import CIEmailField
-from django.core.mail import send_mail
-from django.db import connection, models
+from django.contrib.postgres.fields import CIEmailField, JSONField
+from django.core.mail import EmailMultiAlternatives, send_mail
+from django.db import connection, models, transaction
 from django.db.models import fields
-from django.utils import datastructures, safestring, timezone
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import safestring, timezone
 
 from descriptors import cachedproperty, cachedclassproperty
 
+from review import localcache, survey
+
 
 class StrEnum(str, enum.Enum):
 
@@ -282,6 +288,68 @@ class Reviewer(AbstractBaseUser, PermissionsMixin):
         except ReviewerConcession.DoesNotExist:
             return None
 
+    @cachedproperty
+    def eligibility(self):
+        return ReviewerEligibility.get(self)
+
+
+class ReviewerEligibility(collections.namedtuple('ReviewerEligibility',
+                                                 ('is_reviewer', 'is_interviewer', 'whitelisted'))):
+    """Reviewer's concession to review and/or interview in a given
+    program year, as cached (across requests) by each process.
+
+    Checks of eligibility -- by every view of the review process --
+    thereby usually cost no query. Cached eligibilities of a year are
+    invalidated at once, (in all processes, within seconds), by changes
+    to ReviewerConcession (see signal receivers below) and by command
+    loadapps. (See `review.localcache`.)
+
+    """
+    cache = localcache.VersionedCache(
+        'review:eligibility',
+        getattr(settings, 'REVIEW_ELIGIBILITY_CACHE_TIMEOUT', 60 * 60 * 24),
+    )
+
+    @property
+    def is_eligible(self):
+        return self.whitelisted or self.is_reviewer or self.is_interviewer
+
+    @classmethod
+    def get(cls, reviewer, program_year=None):
+        if program_year is None:
+            program_year = settings.REVIEW_PROGRAM_YEAR
+
+        cached = cls.cache.get(program_year, reviewer.reviewer_id)
+        if cached is not None:
+            return cls._make(cached)
+
+        try:
+            concession = ReviewerConcession.objects.get(
+                reviewer=reviewer,
+                program_year=program_year,
+            )
+        except ReviewerConcession.DoesNotExist:
+            (is_reviewer, is_interviewer) = (False, False)
+        else:
+            (is_reviewer, is_interviewer) = (concession.is_reviewer, concession.is_interviewer)
+
+        eligibility = cls(is_reviewer, is_interviewer, reviewer.email in settings.REVIEW_WHITELIST)
+        cls.cache.set(program_year, reviewer.reviewer_id, tuple(eligibility))
+        return eligibility
+
+    @classmethod
+    def invalidate(cls, program_year=None):
+        """Invalidate all cached eligibilities of the given program year."""
+        if program_year is None:
+            program_year = settings.REVIEW_PROGRAM_YEAR
+
+        cls.cache.invalidate(program_year)
+
+    @classmethod
+    def invalidate_on_commit(cls, program_year=None):
+        # avoid re-caching of stale data between invalidation and commit
+        transaction.on_commit(lambda: cls.invalidate(program_year))
+
 
 class ReviewerConcession(models.Model):
 
@@ -309,6 +377,107 @@ class ReviewerConcession(models.Model):
         ) + f' ({self.program_year})'
 
 
+@receiver(post_save, sender=ReviewerConcession)
+@receiver(post_delete, sender=ReviewerConcession)
+def invalidate_reviewer_eligibility(sender, instance, **_kwargs):
+    ReviewerEligibility.invalidate_on_commit(instance.program_year)
+
+
+class ReviewerDirectoryManager(models.Manager):
+
+    TABLE_PATTERN = r'^survey_reviewer_[0-9]{4}$'
+
+    def get_by_emails(self, emails):
+        """Map the given email addresses (by lower-case) to their
+        directory entries.
+
+        """
+        # (query matches expression index reviewer_directory_email_lower)
+        return {
+            entry.email_lower: entry
+            for entry in self.annotate(email_lower=Lower('email')).filter(
+                email_lower__in={email.lower() for email in emails},
+            )
+        }
+
+    def refresh(self):
+        """Rebuild the directory from all reviewer survey tables, (as
+        loaded by loadwufoo), with each reviewer's latest registration.
+
+        """
+        table_name = self.model._meta.db_table
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # serialize concurrent refreshes
+            cursor.execute(f'lock table {table_name} in exclusive mode')
+
+            cursor.execute(
+                '''select tablename from pg_tables
+                   where schemaname = current_schema() and tablename ~ %s
+                   order by tablename''',
+                [self.TABLE_PATTERN],
+            )
+            survey_tables = [survey_table for (survey_table,) in cursor]
+
+            selects = []
+            for survey_table in survey_tables:
+                year = int(survey_table.rsplit('_', 1)[1])
+                field_ids = SurveyFieldRole.objects.field_ids('reviewer', year)
+                selects.append(f'''
+                    select "{field_ids['email']}"::text as email,
+                           "{field_ids['first_name']}"::text as first_name,
+                           "{field_ids['last_name']}"::text as last_name,
+                           "{field_ids['association']}"::text as association,
+                           {year} as program_year
+                    from "{survey_table}"
+                    where nullif(trim("{field_ids['email']}"::text), '') is not null
+                ''')
+
+            cursor.execute(f'delete from {table_name}')
+
+            if selects:
+                cursor.execute(f'''\
+                    insert into {table_name}
+                        (email, first_name, last_name, association, program_year)
+                    select distinct on (lower(email))
+                           email,
+                           coalesce(first_name, ''),
+                           coalesce(last_name, ''),
+                           coalesce(association, ''),
+                           program_year
+                    from ({'union all'.join(selects)}) registration
+                    order by lower(email), program_year desc
+                ''')
+
+            return cursor.rowcount if selects else 0
+
+
+class ReviewerDirectory(models.Model):
+    """Reviewers' latest registrations (by email address) across the
+    reviewer surveys of all years.
+
+    Materialized from the survey tables, and refreshed by command
+    loadwufoo, (see `ReviewerDirectoryManager.refresh`).
+
+    """
+    reviewer_directory_id = models.AutoField(primary_key=True)
+    email = models.CharField(max_length=254)  # indexed (uniquely) by lower(email)
+    first_name = models.TextField(blank=True)
+    last_name = models.TextField(blank=True)
+    association = models.TextField(blank=True)
+    program_year = models.IntegerField()
+
+    objects = ReviewerDirectoryManager()
+
+    class Meta:
+        db_table = 'reviewer_directory'
+        ordering = ('email',)
+        verbose_name_plural = 'reviewer directory'
+
+    def __str__(self):
+        return f'{self.first_name} {self.last_name} <{self.email}> ({self.program_year})'
+
+
 #
 # Applicant
 #
@@ -385,74 +554,355 @@ class Application(models.Model):
 # SurveyEntries
 #
 
+# last modification of a survey entry, (whose legacy tables' timestamp
+# columns are untyped, and may be empty)
+SURVEY_ENTRY_MODIFIED = ('''greatest(nullif("DateCreated"::text, '')::timestamp, '''
+                         '''nullif("DateUpdated"::text, '')::timestamp)''')
+
 class StaleEntryManager:
+    """Query survey entry links (of the given manager's model) whose
+    survey records no longer exist.
+
+    Links are considered under any number of (table_name, column_name)
+    signatures, (see `SurveyEntryManager.stale_in_year`), such that
+    queries run over all linked tables at once, in a single statement,
+    via a union of per-table anti-joins.
 
-    # note: *could* perhaps easily run queries which run over multiple linked
-    # tables at a time.
-    #
-    # (however, really no need at all for this at the moment.)
-    #
-    # e.g.: provide only program_year;
-    #       look up distinct signatures (select distinct table_name, column_name
-    #                                    from application_page join application
-    #                                    using (application_id)
-    #                                    where program_year=2022);
-    #       union results of per-table query;
-    #       etc.
-
-    def __init__(self, manager, table_name, column_name):
+    """
+    def __init__(self, manager, signatures):
         self.manager = manager
-        self.table_name = table_name
-        self.column_name = column_name
+        self.signatures = tuple(signatures)
 
     def __repr__(self):
-        return f'<{self.__class__.__name__}: ({self.table_name!r}, {self.column_name!r})>'
+        return f'<{self.__class__.__name__}: {self.signatures!r}>'
 
     @property
     def _meta(self):
         return self.manager.model._meta
 
-    def _select_query(self, select='model.*'):
-        return f'''\
-            select {select} from {self._meta.db_table} model
-            left outer join {self.table_name} entry on (
-                model.entity_code = entry."{self.column_name}"
-            )
-            where model.table_name = '{self.table_name}' and
-                  model.column_name = '{self.column_name}' and
-                  entry."{self.column_name}" is null
-        '''
+    def _stale_query(self):
+        """Construct a (union) query of stale links' primary keys and
+        signatures, and its parameters.
+
+        """
+        selects = []
+        params = []
+
+        for (table_name, column_name) in self.signatures:
+            selects.append(f'''
+                select model.{self._meta.pk.name} as pk, model.table_name, model.column_name
+                from {self._meta.db_table} model
+                left outer join "{table_name}" entry on (
+                    model.entity_code = entry."{column_name}"
+                )
+                where model.table_name = %s and
+                      model.column_name = %s and
+                      entry."{column_name}" is null
+            ''')
+            params.extend((table_name, column_name))
+
+        return ('union all'.join(selects), params)
 
     def all(self):
-        return self.manager.raw(self._select_query())
+        if not self.signatures:
+            return self.manager.none()
+
+        (stale_query, params) = self._stale_query()
+        return self.manager.raw(
+            f'''\
+                select model.* from {self._meta.db_table} model
+                join ({stale_query}) stale on (model.{self._meta.pk.name} = stale.pk)
+            ''',
+            params,
+        )
 
-    def count(self):
+    def counts(self):
+        """Count stale links by signature."""
+        if not self.signatures:
+            return {}
+
+        (stale_query, params) = self._stale_query()
         with connection.cursor() as cursor:
-            cursor.execute(self._select_query('count(1)'))
-            (count,) = cursor.fetchone()
+            cursor.execute(
+                f'''\
+                    select table_name, column_name, count(1) from ({stale_query}) stale
+                    group by 1, 2
+                ''',
+                params,
+            )
+            return {(table_name, column_name): count
+                    for (table_name, column_name, count) in cursor}
 
-        return count
+    def count(self):
+        return sum(self.counts().values())
 
     def delete(self):
+        """Delete stale links.
+
+        As with `QuerySet.delete()`, return a tuple of the total number
+        of links deleted and a dictionary of these counts by signature.
+
+        """
+        if not self.signatures:
+            return (0, {})
+
+        (stale_query, params) = self._stale_query()
         with connection.cursor() as cursor:
-            cursor.execute(f'''\
-                delete from {self._meta.db_table} model
-                using {self._meta.db_table} stale
-                left outer join {self.table_name} entry on (
-                    stale.entity_code = entry."{self.column_name}"
-                )
-                where model.{self._meta.pk.name} = stale.{self._meta.pk.name} and
-                      stale.table_name = '{self.table_name}' and
-                      stale.column_name = '{self.column_name}' and
-                      entry."{self.column_name}" is null
-            ''')
-            return cursor.rowcount
+            cursor.execute(
+                f'''\
+                    with stale as ({stale_query}),
+                    deleted as (
+                        delete from {self._meta.db_table} model
+                        using stale
+                        where model.{self._meta.pk.name} = stale.pk
+                        returning model.table_name, model.column_name
+                    )
+                    select table_name, column_name, count(1) from deleted
+                    group by 1, 2
+                ''',
+                params,
+            )
+            counts = {(table_name, column_name): count
+                      for (table_name, column_name, count) in cursor}
+
+        return (sum(counts.values()), counts)
+
+
+def get_survey_columns(table_name):
+    """List the (name, type) of each column of the given survey table,
+    (or none if the table does not exist).
+
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''select attname, format_type(atttypid, atttypmod) from pg_attribute
+               where attrelid = to_regclass(%s) and attnum > 0 and not attisdropped
+               order by attnum''',
+            [table_name],
+        )
+        return list(cursor)
 
 
 class SurveyEntryManager(models.Manager):
 
+    def link(self, table_name, column_name, entity_code, applicant_email, program_year):
+        """Link the given survey entry to the application of the given
+        applicant and program year, (creating these as necessary), or
+        re-link the entry if its applicant has been corrected.
+
+        Returns the entry, and whether it was created or updated (if
+        either).
+
+        """
+        (applicant, _created) = Applicant.objects.get_or_create(email=applicant_email)
+        signature = {
+            'table_name': table_name,
+            'column_name': column_name,
+            'entity_code': entity_code,
+        }
+
+        try:
+            entry = self.get(**signature)
+        except self.model.DoesNotExist:
+            (application, _created) = applicant.applications.get_or_create(program_year=program_year)
+            return (self.create(application=application, **signature), 'created')
+
+        if entry.application.applicant_id != applicant.pk:
+            # entry was *corrected*
+            (application, _created) = applicant.applications.get_or_create(program_year=program_year)
+            entry.application = application
+            entry.save(update_fields=['application'])
+            return (entry, 'updated')
+
+        return (entry, None)
+
+    def _link_query(self, table_name, column_name, email_field, program_year, since):
+        """Construct the subqueries of survey entries (optionally only
+        those created or updated since the given high-water marks) and
+        of applications of the program year, and their parameters.
+
+        """
+        params = {
+            'table_name': table_name,
+            'column_name': column_name,
+            'program_year': program_year,
+        }
+
+        conditions = []
+        if since is not None:
+            conditions.append(f'"{column_name}"::bigint > %(last_entry_id)s')
+            params['last_entry_id'] = since.last_entry_id or 0
+
+            if since.last_modified:
+                conditions.append(f'{SURVEY_ENTRY_MODIFIED} > %(last_modified)s::timestamp')
+                params['last_modified'] = since.last_modified
+
+        where = f"where {' or '.join(conditions)}" if conditions else ''
+
+        entries = f'''(
+            select "{column_name}"::text as entity_code,
+                   nullif(trim("{email_field}"::text), \'\')::citext as email
+            from "{table_name}"
+            {where}
+        ) entries'''
+        applications = f'''(
+            select applicant_id, min(application_id) as application_id
+            from {Application._meta.db_table}
+            where program_year = %(program_year)s
+            group by applicant_id
+        ) application'''
+
+        return (entries, applications, params)
+
+    def link_table(self, table_name, column_name, email_field, program_year, since=None):
+        """Link all entries of the given survey table to the applications
+        of their applicants for the given program year, (creating these
+        as necessary), and re-link entries whose applicants have been
+        corrected.
+
+        The set-based counterpart of `link`. Returns the number of
+        entries processed, created and updated.
+
+        Given the high-water marks of a previous run (`SurveyLinkState`),
+        only those entries created or updated since are processed.
+
+        """
+        (entries, applications, params) = self._link_query(table_name, column_name, email_field,
+                                                            program_year, since)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'select count(1) from {entries}', params)
+            (processed,) = cursor.fetchone()
+
+            cursor.execute(
+                f'''\
+                    insert into {Applicant._meta.db_table} (email, created)
+                    select distinct on (lower(email)) email, now()
+                    from {entries}
+                    where email is not null
+                    on conflict (email) do nothing
+                ''',
+                params,
+            )
+
+            cursor.execute(
+                f'''\
+                    insert into {Application._meta.db_table}
+                        (applicant_id, program_year, review_decision, final_decision, created)
+                    select distinct applicant.applicant_id, %(program_year)s, true, \'\', now()
+                    from {entries}
+                    join {Applicant._meta.db_table} applicant using (email)
+                    where not exists (
+                        select 1 from {Application._meta.db_table} application
+                        where application.applicant_id = applicant.applicant_id and
+                              application.program_year = %(program_year)s
+                    )
+                ''',
+                params,
+            )
+
+            # entries which were *corrected*
+            cursor.execute(
+                f'''\
+                    update {self.model._meta.db_table} entry
+                    set application_id = application.application_id
+                    from {entries}
+                    join {Applicant._meta.db_table} applicant using (email)
+                    join {applications} using (applicant_id)
+                    where entry.table_name = %(table_name)s and
+                          entry.column_name = %(column_name)s and
+                          entry.entity_code = entries.entity_code and
+                          applicant.applicant_id != (
+                              select applicant_id from {Application._meta.db_table}
+                              where application_id = entry.application_id
+                          )
+                ''',
+                params,
+            )
+            updated = cursor.rowcount
+
+            cursor.execute(
+                f'''\
+                    insert into {self.model._meta.db_table}
+                        (table_name, column_name, entity_code, application_id, created)
+                    select %(table_name)s, %(column_name)s, entries.entity_code,
+                           application.application_id, now()
+                    from {entries}
+                    join {Applicant._meta.db_table} applicant using (email)
+                    join {applications} using (applicant_id)
+                    on conflict (table_name, column_name, entity_code) do nothing
+                ''',
+                params,
+            )
+            created = cursor.rowcount
+
+        return (processed, created, updated)
+
+    def plan_table(self, table_name, column_name, email_field, program_year, since=None):
+        """Count, without writing anything, the changes which `link_table`
+        would make, via read-only (anti-)joins.
+
+        Returns the number of entries which would be processed, created
+        and updated, and of applicants which would be created.
+
+        """
+        (entries, _applications, params) = self._link_query(table_name, column_name, email_field,
+                                                             program_year, since)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''\
+                    select count(1),
+                           count(1) filter (
+                               where entries.email is not null and entry.entity_code is null
+                           ),
+                           count(1) filter (
+                               where entries.email is not null and applicant.email != entries.email
+                           ),
+                           count(distinct lower(entries.email)) filter (
+                               where not exists (
+                                   select 1 from {Applicant._meta.db_table} existing
+                                   where existing.email = entries.email
+                               )
+                           )
+                    from {entries}
+                    left join {self.model._meta.db_table} entry on (
+                        entry.table_name = %(table_name)s and
+                        entry.column_name = %(column_name)s and
+                        entry.entity_code = entries.entity_code
+                    )
+                    left join {Application._meta.db_table} application using (application_id)
+                    left join {Applicant._meta.db_table} applicant using (applicant_id)
+                ''',
+                params,
+            )
+            return cursor.fetchone()
+
     def stale(self, table_name, column_name):
-        return StaleEntryManager(self, table_name, column_name)
+        return StaleEntryManager(self, [(table_name, column_name)])
+
+    def signatures(self, program_year):
+        """List the distinct (table_name, column_name) signatures of
+        entries linked to applications of the given program year (and
+        whose survey tables exist).
+
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''\
+                    select distinct table_name, column_name
+                    from {self.model._meta.db_table}
+                    join {Application._meta.db_table} using (application_id)
+                    where program_year = %s and
+                          to_regclass(quote_ident(table_name)) is not null
+                    order by 1, 2
+                ''',
+                [program_year],
+            )
+            return cursor.fetchall()
+
+    def stale_in_year(self, program_year):
+        return StaleEntryManager(self, self.signatures(program_year))
 
 
 class SurveyEntry(models.Model):
@@ -501,11 +951,9 @@ class SurveyEntry(models.Model):
             )
             fields = dict(cursor)
 
-        entry = datastructures.MultiValueDict()
-        for (column, value) in zip(columns, row):
-            key = fields.get(column, column)
-            entry.appendlist(key, value)
-        return entry
+        # schema (columns and their titles) is shared by all entries of table
+        schema = survey.SurveySchema.intern(columns, fields)
+        return schema.record(row)
 
     def __str__(self):
         return str(self.entry)
@@ -527,6 +975,474 @@ class Reference(SurveyEntry):
         db_table = 'reference'
 
 
+#
+# Application status
+#
+
+class ApplicationStatusManager(models.Manager):
+
+    def _status_query(self, program_year, entity_id_field, survey_tables, applicant_fields,
+                      reference_fields):
+        """Construct a subquery of the statuses of the given program
+        year's applications, (named `statuses`), as of their linked
+        survey entries.
+
+        `survey_tables` are the names of the application survey tables
+        (parts 1 and 2) and the recommendation survey table; and, the
+        given field IDs are those of the application (part 1) and
+        recommendation surveys, by role, (see `SurveyFieldRoleManager`).
+
+        """
+        (survey_1_table, survey_2_table, recommendation_table) = survey_tables
+
+        applicant_columns = ', '.join(
+            f'coalesce(survey_1."{applicant_fields[role]}"::text, \'\') as {role}'
+            for role in self.model.APPLICANT_FIELDS
+        )
+        reference_columns = ', '.join(
+            f'coalesce(recommendation."{reference_fields[role]}"::text, \'\') as {role}'
+            for role in ('ref_first', 'ref_last', 'ref_email')
+        )
+
+        subquery = f"""(
+            with application_1 as (
+                -- an application's latest page-1 entry describes it
+                select distinct on (page.application_id)
+                       page.application_id, {applicant_columns}
+                from {ApplicationPage._meta.db_table} page
+                join {Application._meta.db_table} application using (application_id)
+                join "{survey_1_table}" survey_1 on (
+                    survey_1."{entity_id_field}"::text = page.entity_code
+                )
+                where page.table_name = %(survey_1_table)s and
+                      page.column_name = %(column_name)s and
+                      application.program_year = %(program_year)s
+                order by page.application_id, page.entity_code::bigint desc
+            ),
+            application_reference as (
+                select distinct on (reference.application_id, lower(recommendation."{reference_fields['ref_email']}"::text))
+                       reference.application_id, {reference_columns}
+                from {Reference._meta.db_table} reference
+                join "{recommendation_table}" recommendation on (
+                    recommendation."{entity_id_field}"::text = reference.entity_code
+                )
+                where reference.table_name = %(recommendation_table)s and
+                      reference.column_name = %(column_name)s
+                order by reference.application_id,
+                         lower(recommendation."{reference_fields['ref_email']}"::text),
+                         reference.entity_code::bigint desc
+            ),
+            reference_aggregate as (
+                select application_id,
+                       jsonb_agg(jsonb_build_array(ref_first, ref_last, ref_email)
+                                 order by ref_email) as submitted_references,
+                       count(1) as reference_count
+                from application_reference
+                group by 1
+            )
+
+            select application_1.*,
+                   %(program_year)s as program_year,
+                   exists (
+                       select 1 from {ApplicationPage._meta.db_table} page_2
+                       where page_2.application_id = application_1.application_id and
+                             page_2.table_name = %(survey_2_table)s and
+                             page_2.column_name = %(column_name)s
+                   ) as app_completed,
+                   exists (
+                       select 1 from application_reference
+                       where application_reference.application_id = application_1.application_id and
+                             lower(application_reference.ref_email) = lower(application_1.ref0_email)
+                   ) as ref0_submitted,
+                   exists (
+                       select 1 from application_reference
+                       where application_reference.application_id = application_1.application_id and
+                             lower(application_reference.ref_email) = lower(application_1.ref1_email)
+                   ) as ref1_submitted,
+                   exists (
+                       select 1 from {ApplicationCompleteMessage._meta.db_table} email_complete
+                       where email_complete.application_id = application_1.application_id
+                   ) as email_complete_sent,
+                   coalesce(reference_aggregate.submitted_references, '[]'::jsonb)
+                       as submitted_references,
+                   coalesce(reference_aggregate.reference_count, 0) as reference_count
+            from application_1
+            left join reference_aggregate using (application_id)
+        ) statuses"""
+
+        params = {
+            'program_year': program_year,
+            'column_name': entity_id_field,
+            'survey_1_table': survey_1_table,
+            'survey_2_table': survey_2_table,
+            'recommendation_table': recommendation_table,
+        }
+
+        return (subquery, params)
+
+    def refresh(self, program_year, entity_id_field, survey_tables, applicant_fields,
+                reference_fields):
+        """Upsert the statuses of the given program year's applications,
+        (writing only those which have changed), and delete those of
+        applications no longer linked to application surveys, in one
+        statement.
+
+        Returns the number of statuses processed, created, updated and
+        deleted.
+
+        """
+        (statuses, params) = self._status_query(program_year, entity_id_field, survey_tables,
+                                                applicant_fields, reference_fields)
+
+        table_name = self.model._meta.db_table
+        columns = self.model.STATUS_FIELDS
+        column_list = ', '.join(columns)
+        update_list = ', '.join(f'{column} = excluded.{column}' for column in columns)
+        row_existing = ', '.join(f'{table_name}.{column}' for column in columns)
+        row_excluded = ', '.join(f'excluded.{column}' for column in columns)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""\
+                    with status as (
+                        select * from {statuses}
+                    ),
+                    deleted as (
+                        delete from {table_name} existing
+                        where existing.program_year = %(program_year)s and
+                              not exists (
+                                  select 1 from status
+                                  where status.application_id = existing.application_id
+                              )
+                        returning 1
+                    ),
+                    upsert as (
+                        insert into {table_name} (application_id, {column_list}, updated)
+                        select application_id, {column_list}, now()
+                        from status
+                        on conflict (application_id) do update
+                        set {update_list}, updated = excluded.updated
+                        where ({row_existing}) is distinct from ({row_excluded})
+                        returning (xmax = 0) as created
+                    )
+
+                    select (select count(1) from status),
+                           count(1) filter (where created),
+                           count(1) filter (where not created),
+                           (select count(1) from deleted)
+                    from upsert
+                """,
+                params,
+            )
+            return cursor.fetchone()
+
+    def plan(self, program_year, entity_id_field, survey_tables, applicant_fields,
+             reference_fields):
+        """Count, without writing anything, the changes which `refresh`
+        would make.
+
+        """
+        (statuses, params) = self._status_query(program_year, entity_id_field, survey_tables,
+                                                applicant_fields, reference_fields)
+
+        table_name = self.model._meta.db_table
+        row_existing = ', '.join(f'existing.{column}' for column in self.model.STATUS_FIELDS)
+        row_status = ', '.join(f'statuses.{column}' for column in self.model.STATUS_FIELDS)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""\
+                    select count(1),
+                           count(1) filter (where existing.application_id is null),
+                           count(1) filter (
+                               where existing.application_id is not null and
+                                     ({row_existing}) is distinct from ({row_status})
+                           ),
+                           (
+                               select count(1) from {table_name} stale
+                               where stale.program_year = %(program_year)s and
+                                     stale.application_id not in (
+                                         select application_id from {statuses}
+                                     )
+                           )
+                    from {statuses}
+                    left join {table_name} existing using (application_id)
+                """,
+                params,
+            )
+            return cursor.fetchone()
+
+    def mark_complete_sent(self, application_ids):
+        return self.filter(application_id__in=application_ids).update(email_complete_sent=True)
+
+
+class ApplicationStatus(models.Model):
+    """Status of an application -- its completion, the submission of its
+    references, and whether its applicant has been notified of these --
+    as of its linked survey entries.
+
+    Maintained by command loadapps, (see `ApplicationStatusManager.refresh`),
+    for command sendstatus.
+
+    """
+    APPLICANT_FIELDS = (
+        'app_first',
+        'app_last',
+        'app_email',
+        'ref0_first',
+        'ref0_last',
+        'ref0_email',
+        'ref1_first',
+        'ref1_last',
+        'ref1_email',
+    )
+
+    STATUS_FIELDS = APPLICANT_FIELDS + (
+        'program_year',
+        'app_completed',
+        'ref0_submitted',
+        'ref1_submitted',
+        'email_complete_sent',
+        'submitted_references',
+        'reference_count',
+    )
+
+    application = models.OneToOneField('review.Application',
+                                       on_delete=models.CASCADE,
+                                       primary_key=True,
+                                       related_name='status')
+    program_year = models.IntegerField()
+
+    app_first = models.TextField(blank=True)
+    app_last = models.TextField(blank=True)
+    app_email = models.TextField(blank=True)
+    ref0_first = models.TextField(blank=True)
+    ref0_last = models.TextField(blank=True)
+    ref0_email = models.TextField(blank=True)
+    ref1_first = models.TextField(blank=True)
+    ref1_last = models.TextField(blank=True)
+    ref1_email = models.TextField(blank=True)
+
+    app_completed = models.BooleanField(default=False)
+    ref0_submitted = models.BooleanField(default=False)
+    ref1_submitted = models.BooleanField(default=False)
+    email_complete_sent = models.BooleanField(default=False)
+
+    # [first name, last name, email] of each reference submitted
+    submitted_references = JSONField(default=list)
+    reference_count = models.PositiveSmallIntegerField(default=0)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = ApplicationStatusManager()
+
+    class Meta:
+        db_table = 'application_status'
+        verbose_name_plural = 'application statuses'
+        indexes = [
+            models.Index(fields=['program_year', 'app_completed', 'email_complete_sent'],
+                         name='application_status_flags'),
+        ]
+
+    def __str__(self):
+        return f'{self.app_email} ({self.program_year})'
+
+
+#
+# Survey catalog
+#
+
+class SurveyFieldRoleManager(models.Manager):
+
+    cache = localcache.VersionedCache(
+        'review:catalog',
+        getattr(settings, 'REVIEW_CATALOG_CACHE_TIMEOUT', 60 * 60 * 24),
+    )
+
+    def field_ids(self, form_name, program_year=None):
+        """Map the semantic roles of a survey form's fields to their
+        field IDs (and survey table column names).
+
+        The mapping is cached per process, (once the form has been
+        catalogued), until invalidated by a load of the form, (see
+        `review.localcache`). Roles missing from the catalog fall back
+        to their defaults, as configured by REVIEW_SURVEY_CATALOG.
+
+        """
+        if program_year is None:
+            program_year = settings.REVIEW_PROGRAM_YEAR
+
+        scope = f'{form_name}:{program_year}'
+        field_ids = self.cache.get(scope, 'field_ids')
+
+        if field_ids is None:
+            catalogued = dict(
+                self.filter(form_name=form_name, program_year=program_year)
+                .values_list('role', 'field_id')
+            )
+
+            field_ids = {
+                field_role.role: field_role.default
+                for field_role in settings.REVIEW_SURVEY_CATALOG.get(form_name, ())
+            }
+            field_ids.update(catalogued)
+
+            if catalogued:
+                # (fallbacks of an uncatalogued form would mask its later load)
+                self.cache.set(scope, 'field_ids', field_ids)
+
+        return field_ids
+
+    def field_id(self, form_name, role, program_year=None):
+        return self.field_ids(form_name, program_year)[role]
+
+    def invalidate(self, form_name, program_year):
+        self.cache.invalidate(f'{form_name}:{program_year}')
+
+
+class SurveyFieldRole(models.Model):
+    """Catalog entry mapping a semantic role of a survey form field to
+    its field ID (as resolved by command loadwufoo).
+
+    """
+    survey_field_role_id = models.AutoField(primary_key=True)
+    form_name = models.CharField(max_length=100)
+    program_year = models.IntegerField()
+    role = models.CharField(max_length=100)
+    field_id = models.CharField(max_length=100)
+    field_title = models.TextField(blank=True)
+    resolved = models.DateTimeField(auto_now=True)
+
+    objects = SurveyFieldRoleManager()
+
+    class Meta:
+        db_table = 'survey_catalog'
+        ordering = ('-program_year', 'form_name', 'role')
+        unique_together = (
+            ('form_name', 'program_year', 'role'),
+        )
+
+    def __str__(self):
+        return f'{self.form_name} ({self.program_year}): {self.role} → {self.field_id}'
+
+
+class SurveySyncState(models.Model):
+    """High-water marks of the survey entries most recently loaded into
+    a survey table (by command loadwufoo), from which subsequent loads
+    may proceed incrementally.
+
+    """
+    table_name = models.CharField(max_length=100, primary_key=True)
+    form_hash = models.CharField(max_length=100)
+    last_entry_id = models.BigIntegerField(null=True)
+    last_modified = models.CharField(max_length=30, blank=True)  # as formatted by Wufoo
+    synced = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'survey_sync_state'
+        ordering = ('table_name',)
+
+    def __str__(self):
+        return f'{self.table_name}: {self.last_entry_id} ({self.last_modified})'
+
+
+class SurveyLinkStateManager(models.Manager):
+
+    def mark(self, table_name, column_name):
+        """Construct (but do not save) the current high-water marks of
+        the given survey table, whose entities are identified by the
+        given (integral) column.
+
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f'''\
+                select max("{column_name}"::bigint),
+                       max({SURVEY_ENTRY_MODIFIED})::text
+                from "{table_name}"
+            ''')
+            (last_entry_id, last_modified) = cursor.fetchone()
+
+        return self.model(table_name=table_name,
+                          last_entry_id=last_entry_id,
+                          last_modified=last_modified or '')
+
+
+class SurveyLinkState(models.Model):
+    """High-water marks of the survey entries most recently linked to
+    applications (by command loadapps), from which subsequent runs may
+    proceed incrementally.
+
+    """
+    table_name = models.CharField(max_length=100, primary_key=True)
+    last_entry_id = models.BigIntegerField(null=True)
+    last_modified = models.CharField(max_length=30, blank=True)  # as formatted by postgres
+    linked = models.DateTimeField(auto_now=True)
+
+    objects = SurveyLinkStateManager()
+
+    class Meta:
+        db_table = 'survey_link_state'
+        ordering = ('table_name',)
+
+    def __str__(self):
+        return f'{self.table_name}: {self.last_entry_id} ({self.last_modified})'
+
+
+class SurveyLoadQuerySet(models.QuerySet):
+
+    def latest_by_form(self, program_year):
+        """The most recent successful load of each form of the given
+        program year.
+
+        """
+        return (
+            self.filter(program_year=program_year, succeeded=True)
+            .order_by('form_name', '-finished')
+            .distinct('form_name')
+        )
+
+
+class SurveyLoad(models.Model):
+    """History of the loads of survey forms (by command loadwufoo), with
+    the timings of their stages.
+
+    """
+    survey_load_id = models.AutoField(primary_key=True)
+    form_name = models.CharField(max_length=100)
+    program_year = models.IntegerField()
+    started = models.DateTimeField()
+    finished = models.DateTimeField()
+    succeeded = models.BooleanField()
+    entries = models.IntegerField()
+    stages = JSONField(default=dict)  # {stage: {seconds, rows, bytes}}
+
+    objects = SurveyLoadQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'survey_load'
+        get_latest_by = 'finished'
+        ordering = ('-finished',)
+
+    def __str__(self):
+        return f'{self.form_name} ({self.program_year}): {self.finished}'
+
+    @property
+    def duration(self):
+        return self.finished - self.started
+
+    def summary(self):
+        return {
+            'form': self.form_name,
+            'program_year': self.program_year,
+            'started': self.started.isoformat(),
+            'finished': self.finished.isoformat(),
+            'seconds': round(self.duration.total_seconds(), 3),
+            'succeeded': self.succeeded,
+            'entries': self.entries,
+            'stages': self.stages,
+        }
+
+
 #
 # Review
 #
@@ -875,3 +1791,179 @@ class ApplicationCompleteMessage(EmailMessage):
 
     class Meta(EmailMessage.Meta):
         db_table = 'email_message_application_complete'
+
+
+class OutboxMessageQuerySet(models.QuerySet):
+
+    def pending(self):
+        return self.filter(sent=None, failed=None)
+
+
+class OutboxMessageManager(models.Manager.from_queryset(OutboxMessageQuerySet)):
+
+    def existing_keys(self, keys):
+        return set(self.filter(idempotency_key__in=keys).values_list('idempotency_key', flat=True))
+
+    def enqueue(self, entries):
+        """Enqueue the given rendered messages, (idempotency_key,
+        template, message), skipping those whose keys are already
+        enqueued.
+
+        Returns the number of messages actually enqueued.
+
+        """
+        outbox_messages = [
+            self.model(
+                idempotency_key=key,
+                template=template,
+                recipients=', '.join(message.recipients()),
+                message=OutboxMessage.serialize(message),
+            )
+            for (key, template, message) in entries
+        ]
+        if not outbox_messages:
+            return 0
+
+        # (rather than bulk_create, which doesn't count rows skipped by conflict)
+        table_name = self.model._meta.db_table
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        column_list = ', '.join(field.column for field in fields)
+        row_placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+        params = [
+            field.get_db_prep_save(field.pre_save(outbox_message, True), connection)
+            for outbox_message in outbox_messages
+            for field in fields
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''\
+                    insert into {table_name} ({column_list})
+                    values {', '.join([row_placeholder] * len(outbox_messages))}
+                    on conflict (idempotency_key) do nothing
+                    returning 1
+                ''',
+                params,
+            )
+            return cursor.rowcount
+
+    def claim(self, count, lease):
+        """Claim up to the given number of pending messages which are
+        due, for the given lease (in seconds), skipping those claimed by
+        concurrent transactions.
+
+        """
+        table_name = self.model._meta.db_table
+        return sorted(
+            self.raw(
+                f'''\
+                    update {table_name} set available = now() + %s * interval '1 second'
+                    where outbox_message_id in (
+                        select outbox_message_id from {table_name}
+                        where sent is null and failed is null and available <= now()
+                        order by outbox_message_id
+                        limit %s
+                        for update skip locked
+                    )
+                    returning *
+                ''',
+                [lease, count],
+            ),
+            key=lambda outbox_message: outbox_message.pk,
+        )
+
+
+class OutboxMessage(models.Model):
+    """Rendered email message, enqueued (by the bulk email commands)
+    to be sent by command drainoutbox.
+
+    See: `review.outbox`.
+
+    """
+    outbox_message_id = models.BigAutoField(primary_key=True)
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    template = models.CharField(max_length=200)
+    recipients = models.TextField()
+    message = JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+    available = models.DateTimeField(default=timezone.now)  # due (or claimed until)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    sent = models.DateTimeField(null=True, db_index=True)
+    failed = models.DateTimeField(null=True)
+
+    objects = OutboxMessageManager()
+
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ('outbox_message_id',)
+        indexes = [
+            models.Index(fields=['available'], name='email_outbox_pending',
+                         condition=models.Q(sent=None, failed=None)),
+        ]
+
+    def __str__(self):
+        return f'{self.template} to {self.recipients} ({self.status})'
+
+    @property
+    def status(self):
+        if self.sent:
+            return 'sent'
+        if self.failed:
+            return 'failed'
+        return 'pending'
+
+    @staticmethod
+    def serialize(message):
+        return {
+            'subject': message.subject,
+            'body': message.body,
+            'content_subtype': message.content_subtype,
+            'alternatives': list(getattr(message, 'alternatives', ())),
+            'from_email': message.from_email,
+            'to': message.to,
+            'cc': message.cc,
+            'bcc': message.bcc,
+            'reply_to': message.reply_to,
+            'headers': message.extra_headers,
+        }
+
+    def get_email_message(self):
+        data = self.message
+        message = EmailMultiAlternatives(
+            data['subject'],
+            data['body'],
+            data['from_email'],
+            data['to'],
+            data['bcc'],
+            cc=data['cc'],
+            reply_to=data['reply_to'],
+            headers=data['headers'],
+            alternatives=[tuple(alternative) for alternative in data['alternatives']],
+        )
+        message.content_subtype = data['content_subtype']
+        return message
+
+    def mark_sent(self):
+        self.sent = timezone.now()
+        self.attempts += 1
+        self.save(update_fields=('sent', 'attempts'))
+
+    def mark_failed(self, error, max_attempts, backoff):
+        """Record the given failure to send, and reschedule the message
+        (with exponential backoff from the given seconds) or, if out of
+        attempts, give up on it.
+
+        """
+        now = timezone.now()
+
+        self.attempts += 1
+        self.last_error = repr(error)
+
+        if self.attempts >= max_attempts:
+            self.failed = now
+        else:
+            self.available = now + datetime.timedelta(seconds=backoff * 2 ** (self.attempts - 1))
+
+        self.save(update_fields=('attempts', 'last_error', 'failed', 'available'))
@@ -0,0 +1,91 @@
+"""Durable outbox of rendered email messages.
+
+Bulk email commands enqueue their rendered messages -- each under an
+idempotency key, such that enqueueing these again is harmless -- along
+with any records of their sending, in one transaction.
+
+The outbox is drained (by those commands, or by command drainoutbox, on
+any node) by worker threads which claim due messages under a lease,
+send these via a pool of SMTP connections and mark each sent as it is.
+Failed messages are retried with exponential backoff; and, messages
+claimed by a worker which crashed are reclaimed once their lease
+expires. (As such, only a message in flight as its worker crashes may
+be sent twice.)
+
+"""
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from django import db
+
+from review import mailpool
+from review.models import OutboxMessage
+
+
+CLAIM_SIZE = 10
+
+LEASE = 60 * 5
+
+MAX_ATTEMPTS = 5
+
+BACKOFF = 60
+
+
+def drain(connections=mailpool.CONNECTIONS,
+          rate=mailpool.RATE,
+          claim_size=CLAIM_SIZE,
+          lease=LEASE,
+          max_attempts=MAX_ATTEMPTS,
+          backoff=BACKOFF,
+          log=None):
+    """Send all messages of the outbox which are due, in parallel.
+
+    Returns counts of messages sent, rescheduled (`retry`) and given up
+    on (`failed`).
+
+    """
+    counts = collections.Counter()
+
+    with mailpool.ConnectionPool(rate=rate) as pool, \
+            ThreadPoolExecutor(max_workers=connections,
+                               thread_name_prefix='outbox') as executor:
+        futures = [
+            executor.submit(drain_worker, pool, claim_size, lease, max_attempts, backoff, log)
+            for _index in range(connections)
+        ]
+
+        for future in futures:
+            counts.update(future.result())
+
+    return counts
+
+
+def drain_worker(pool, claim_size, lease, max_attempts, backoff, log):
+    """Claim and send batches of due messages until none remain."""
+    counts = collections.Counter()
+
+    try:
+        while True:
+            outbox_messages = OutboxMessage.objects.claim(claim_size, lease)
+
+            if not outbox_messages:
+                return counts
+
+            for outbox_message in outbox_messages:
+                try:
+                    pool.send_message(outbox_message.get_email_message())
+                except Exception as exc:
+                    outbox_message.mark_failed(exc, max_attempts, backoff)
+
+                    outcome = 'failed' if outbox_message.failed else 'retry'
+                    counts[outcome] += 1
+
+                    if log:
+                        log(f'E: {outcome} ({outbox_message.attempts}) '
+                            f'{outbox_message.pk} to: {outbox_message.recipients}: {exc!r}')
+                else:
+                    outbox_message.mark_sent()
+                    counts['sent'] += 1
+    finally:
+        # worker threads' database connections are their own
+        db.connection.close()
@@ -0,0 +1,145 @@
+"""Encoding of rows for PostgreSQL COPY in binary format.
+
+Rows are encoded lazily, such that they may be streamed to the database
+(via `IteratorReader`) straight from their source.
+
+"""
+import datetime
+import decimal
+import io
+import struct
+
+
+SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+
+# signature, flags and header extension length
+HEADER = SIGNATURE + struct.pack('!ii', 0, 0)
+
+TRAILER = struct.pack('!h', -1)
+
+NULL = struct.pack('!i', -1)
+
+EPOCH_DATE = datetime.date(2000, 1, 1)
+
+EPOCH = datetime.datetime(2000, 1, 1)
+
+
+def encode_text(value):
+    return value.encode('utf-8')
+
+
+def encode_boolean(value):
+    return b'\x01' if value else b'\x00'
+
+
+def encode_numeric(value):
+    (sign, digits, exponent) = decimal.Decimal(value).as_tuple()
+
+    if not isinstance(exponent, int):
+        raise ValueError(f"cannot encode non-finite numeric: {value}")
+
+    scale = max(0, -exponent)
+
+    # align digits to groups of base 10000 (about the decimal point)
+    digits = ''.join(str(digit) for digit in digits)
+    padding = exponent % 4
+    digits += '0' * padding
+    exponent -= padding
+    digits = '0' * (-len(digits) % 4) + digits
+
+    groups = [int(digits[index:index + 4]) for index in range(0, len(digits), 4)]
+    weight = len(groups) - 1 + exponent // 4
+
+    while groups and groups[0] == 0:
+        groups.pop(0)
+        weight -= 1
+
+    while groups and groups[-1] == 0:
+        groups.pop()
+
+    if not groups:
+        weight = 0
+
+    return struct.pack(f'!hhHh{len(groups)}H',
+                       len(groups),
+                       weight,
+                       0x4000 if sign else 0x0000,
+                       scale,
+                       *groups)
+
+
+def encode_date(value):
+    return struct.pack('!i', (value - EPOCH_DATE).days)
+
+
+def encode_timestamp(value):
+    delta = value - EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return struct.pack('!q', microseconds)
+
+
+# encoders by (canonical) column type name
+# (text-like columns, e.g. of types varchar and citext, are encoded as text)
+ENCODERS = {
+    'boolean': encode_boolean,
+    'date': encode_date,
+    'numeric': encode_numeric,
+    'timestamp without time zone': encode_timestamp,
+}
+
+
+def get_encoder(type_name):
+    return ENCODERS.get(type_name, encode_text)
+
+
+def encode_rows(rows, type_names):
+    """Generate the binary COPY data of the given rows, (sequences of
+    values, with None indicating NULL), whose columns are of the given
+    types.
+
+    """
+    encoders = [get_encoder(type_name) for type_name in type_names]
+    field_count = struct.pack('!h', len(encoders))
+
+    yield HEADER
+
+    for row in rows:
+        chunks = [field_count]
+
+        for (encoder, value) in zip(encoders, row):
+            if value is None:
+                chunks.append(NULL)
+            else:
+                data = encoder(value)
+                chunks.append(struct.pack('!i', len(data)))
+                chunks.append(data)
+
+        yield b''.join(chunks)
+
+    yield TRAILER
+
+
+class IteratorReader(io.RawIOBase):
+    """Readable binary stream of the bytes generated by the given
+    iterable.
+
+    """
+    def __init__(self, iterable):
+        super().__init__()
+        self._iterator = iter(iterable)
+        self._pending = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._iterator))
+            except StopIteration:
+                return 0
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
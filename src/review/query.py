@@ -36,12 +36,8 @@ def apps_to_review(reviewer, *, application_id=None, limit=None,
 
     """
     # Test that reviewer can help with application reviews
-    if settings.REVIEW_REVIEWER_APPROVED and reviewer.email not in settings.REVIEW_WHITELIST and (
-        not reviewer.concession or (
-            not reviewer.concession.is_reviewer and
-            not reviewer.concession.is_interviewer
-        )
-    ):
+    # (eligibility is cached across requests -- see ReviewerEligibility)
+    if settings.REVIEW_REVIEWER_APPROVED and not reviewer.eligibility.is_eligible:
         raise UnexpectedReviewer
 
     # Return stream of applications appropriate to reviewer,
@@ -3,7 +3,7 @@ import itertools
 
 import django_tables2 as tables
 from django.conf import settings
-from django.db.models import Count, Q, Max
+from django.db.models import Count, F, Q, Max
 
 from review import models, query
 
@@ -239,3 +239,127 @@ class ReviewerReviewTable(TotalingTable):
 
 def reviewer_review_table(**kwargs):
     return ReviewerReviewTable(reviewer_review_counts().iterator(), **kwargs)
+
+
+# Interview round report #
+
+def interview_round_counts():
+    return (
+        models.InterviewAssignment.objects
+        .current_year()
+        .values('interview_round')
+        .annotate(
+            assignment_count=Count('interview_assignment_id'),
+            notified_count=Count(
+                'interview_assignment_id',
+                filter=Q(notified__isnull=False),
+            ),
+            review_count=Count('interview_review'),
+        )
+        .order_by('interview_round')
+    )
+
+
+class InterviewRoundTable(TotalingTable):
+
+    __title__ = 'Interview rounds'
+
+    interview_round = tables.Column(verbose_name='Round')
+    assignment_count = SummingColumn(verbose_name='Assignments')
+    notified_count = SummingColumn(verbose_name='Notified')
+    review_count = SummingColumn(verbose_name='Reviews submitted')
+
+
+def interview_round_table(**kwargs):
+    return InterviewRoundTable(interview_round_counts().iterator(), **kwargs)
+
+
+# Interview recommendation report #
+
+def interview_recommendation_counts():
+    return (
+        models.InterviewAssignment.objects
+        .current_year()
+        .values('interview_round')
+        .annotate(**{
+            f'{recommendation.name}_count': Count(
+                'interview_review',
+                filter=Q(
+                    interview_review__overall_recommendation=recommendation.name,
+                ),
+            )
+            for recommendation in models.InterviewReview.OverallRecommendation
+        })
+        .order_by('interview_round')
+    )
+
+
+class InterviewRecommendationTable(TotalingTable):
+
+    __title__ = 'Interview recommendations'
+
+    interview_round = tables.Column(verbose_name='Round')
+    accept_count = SummingColumn(verbose_name='Review: accept')
+    probably_accept_count = SummingColumn(verbose_name='Review: probably accept')
+    reject_count = SummingColumn(verbose_name='Review: reject')
+    only_if_count = SummingColumn(verbose_name='Review: only if…')
+
+
+def interview_recommendation_table(**kwargs):
+    return InterviewRecommendationTable(interview_recommendation_counts().iterator(), **kwargs)
+
+
+# Interviewer reviews report #
+
+def interviewer_review_counts():
+    current_year_filter = Q(
+        interview_assignments__application__program_year=settings.REVIEW_PROGRAM_YEAR,
+    )
+
+    return (
+        models.Reviewer.objects
+        .annotate(
+            assignment_count=Count(
+                'interview_assignments',
+                filter=current_year_filter,
+            ),
+            notified_count=Count(
+                'interview_assignments',
+                filter=(
+                    current_year_filter &
+                    Q(interview_assignments__notified__isnull=False)
+                ),
+            ),
+            review_count=Count(
+                'interview_assignments__interview_review',
+                filter=current_year_filter,
+            ),
+            last_review=Max(
+                'interview_assignments__interview_review__submitted',
+                filter=current_year_filter,
+            ),
+        )
+        .annotate(
+            outstanding_count=F('assignment_count') - F('review_count'),
+        )
+        .filter(assignment_count__gt=0)
+        .values('email', 'assignment_count', 'notified_count', 'review_count',
+                'outstanding_count', 'last_review')
+        .order_by('-outstanding_count', 'email')
+    )
+
+
+class InterviewerReviewTable(TotalingTable):
+
+    __title__ = 'Interviewer reviews'
+
+    email = tables.Column()
+    assignment_count = SummingColumn(verbose_name='Assignments')
+    notified_count = SummingColumn(verbose_name='Notified')
+    review_count = SummingColumn(verbose_name='Reviews submitted')
+    outstanding_count = SummingColumn(verbose_name='Reviews outstanding')
+    last_review = tables.Column()
+
+
+def interviewer_review_table(**kwargs):
+    return InterviewerReviewTable(interviewer_review_counts().iterator(), **kwargs)
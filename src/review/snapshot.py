@@ -0,0 +1,132 @@
+"""Columnar snapshots of Wufoo form entries, (as compressed Arrow IPC
+files), for reproducible loads without the Wufoo API.
+
+Entries are snapshotted as retrieved, (their values as strings), along
+with their form and its fields; and, snapshots may be read back, memory-
+mapped, via `SnapshotClient`, which stands in for `wufoo.Client`.
+
+pyarrow is required only to write or to read snapshots.
+
+"""
+import itertools
+import json
+import os
+import pathlib
+
+from review.wufoo import WufooAPIError
+
+
+BATCH_SIZE = 1000
+
+COMPRESSION = 'zstd'
+
+SUFFIX = '.arrow'
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError as exc:
+        raise ImportError("snapshots require the optional dependency pyarrow") from exc
+
+    return pyarrow
+
+
+def get_path(directory, name, year):
+    return pathlib.Path(directory) / f'{name}_{year}{SUFFIX}'
+
+
+def tee(entries, path, head, form, fields, batch_size=BATCH_SIZE):
+    """Generate the given entries, writing these as well to a snapshot
+    at the given path.
+
+    The snapshot is only written in full, (once all entries have been
+    generated).
+
+    """
+    pa = import_pyarrow()
+
+    schema = pa.schema(
+        [(key, pa.string()) for key in head],
+        metadata={
+            'form': json.dumps({'Name': form['Name'], 'Hash': form['Hash']}),
+            'fields': json.dumps([
+                {'ID': field_id, 'Title': field_title, 'Type': field_type}
+                for (field_id, field_title, field_type) in fields
+            ]),
+        },
+    )
+    options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+
+    path = pathlib.Path(path)
+    path_tmp = path.with_name(path.name + '.tmp')
+
+    with pa.OSFile(str(path_tmp), 'wb') as sink, \
+            pa.ipc.new_file(sink, schema, options=options) as writer:
+        iterator = iter(entries)
+
+        for batch in iter(lambda: list(itertools.islice(iterator, batch_size)), []):
+            writer.write_batch(pa.RecordBatch.from_pylist(
+                [
+                    {key: (None if value is None else str(value))
+                     for (key, value) in entry.items()}
+                    for entry in batch
+                ],
+                schema=schema,
+            ))
+
+            yield from batch
+
+    os.replace(path_tmp, path)
+
+
+class Snapshot:
+    """Memory-mapped snapshot of a form's entries."""
+
+    def __init__(self, path):
+        pa = import_pyarrow()
+
+        self.path = path
+        self.reader = pa.ipc.open_file(pa.memory_map(str(path)))
+
+        metadata = self.reader.schema.metadata
+        self.form = json.loads(metadata[b'form'])
+        self.fields = json.loads(metadata[b'fields'])
+
+    def stream_entries(self):
+        for index in range(self.reader.num_record_batches):
+            yield from self.reader.get_batch(index).to_pylist()
+
+
+class SnapshotClient:
+    """Stand-in for `wufoo.Client`, retrieving forms, their fields and
+    their entries from the snapshots in the given directory.
+
+    Entry filters are ignored: snapshots are replayed in full.
+
+    """
+    def __init__(self, directory, log=None, **_options):
+        self.snapshots = {}
+
+        for path in sorted(pathlib.Path(directory).glob(f'*{SUFFIX}')):
+            snapshot = Snapshot(path)
+            self.snapshots[snapshot.form['Hash']] = snapshot
+
+        self.log = log
+        self.bytes_received = 0
+
+    def get_snapshot(self, form_hash):
+        try:
+            return self.snapshots[form_hash]
+        except KeyError:
+            raise WufooAPIError(f'{form_hash}: no snapshot')
+
+    def get_forms(self):
+        return [snapshot.form for snapshot in self.snapshots.values()]
+
+    def get_fields(self, form_hash):
+        return self.get_snapshot(form_hash).fields
+
+    def stream_entries(self, form_hash, page_size=None, filter_string=None):
+        return self.get_snapshot(form_hash).stream_entries()
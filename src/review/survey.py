@@ -1,10 +1,169 @@
-"""Presentation helpers for survey form data.
+"""Survey form data records and presentation helpers.
 
-(For use in the fieldspec at REVIEW_APPLICATION_FIELDS.)
+(Presentation helpers for use in the fieldspec at REVIEW_APPLICATION_FIELDS.)
 
 """
 import abc
 import collections
+import re
+
+from django.utils.datastructures import MultiValueDictKeyError
+
+
+class FieldRole(collections.namedtuple('FieldRole',
+                                       ('role', 'pattern', 'occurrence', 'default'))):
+    """Semantic role of a survey form field (for use in the catalog
+    spec at REVIEW_SURVEY_CATALOG).
+
+    The field is identified by the `occurrence` (index) of its title
+    among those form fields whose titles match regular expression
+    `pattern`, (case-insensitive). Only should no field match is the
+    `default` field ID used, (if it is among the form's fields).
+
+    """
+    def __new__(cls, role, pattern=None, occurrence=0, default=None):
+        return super().__new__(cls, role, pattern, occurrence, default)
+
+    def resolve(self, fields):
+        """Resolve this role to a field of the given sequence of
+        (field_id, field_title) pairs.
+
+        Returns the matching pair or None.
+
+        """
+        fields = [(field_id, field_title or '') for (field_id, field_title) in fields]
+
+        if self.pattern is not None:
+            matches = [field for field in fields
+                       if re.search(self.pattern, field[1], re.I)]
+
+            try:
+                return matches[self.occurrence]
+            except IndexError:
+                pass
+
+        # fall back to the default field ID (only) in the absence of a match
+        for field in fields:
+            if field[0] == self.default:
+                return field
+
+        return None
+
+
+class SurveySchema:
+    """Column names of a survey table and the mapping of their (title)
+    keys to column indices.
+
+    Schemas are interned, such that a single schema is shared by all
+    records of a survey table (see `SurveySchema.intern`).
+
+    """
+    __slots__ = ('columns', 'keys', 'index')
+
+    _registry = {}
+
+    def __init__(self, columns, keys):
+        self.columns = tuple(columns)
+        self.keys = tuple(keys)
+
+        index = collections.OrderedDict()
+        for (position, key) in enumerate(self.keys):
+            index.setdefault(key, []).append(position)
+
+        self.index = collections.OrderedDict(
+            (key, tuple(positions)) for (key, positions) in index.items()
+        )
+
+    @classmethod
+    def intern(cls, columns, fields):
+        """Retrieve the shared schema of the given table columns, keyed
+        by their titles as given by the mapping `fields`.
+
+        """
+        columns = tuple(columns)
+        keys = tuple(fields.get(column, column) for column in columns)
+        signature = (columns, keys)
+
+        try:
+            return cls._registry[signature]
+        except KeyError:
+            return cls._registry.setdefault(signature, cls(columns, keys))
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self.columns)} columns>'
+
+    def record(self, values):
+        return SurveyRecord(self, values)
+
+
+class SurveyRecord:
+    """Read-only survey table record.
+
+    Exposes the same read interface as `MultiValueDict` -- (keys
+    mapping to possibly multiple values, as survey field titles are
+    not unique) -- while storing only a tuple of values per record.
+
+    """
+    __slots__ = ('schema', '_values')
+
+    def __init__(self, schema, values):
+        self.schema = schema
+        self._values = tuple(values)
+
+        if len(self._values) != len(schema.columns):
+            raise ValueError("record values do not match schema")
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {dict(self.lists())!r}>'
+
+    def __len__(self):
+        return len(self.schema.index)
+
+    def __iter__(self):
+        return iter(self.schema.index)
+
+    def __contains__(self, key):
+        return key in self.schema.index
+
+    def __getitem__(self, key):
+        try:
+            positions = self.schema.index[key]
+        except KeyError:
+            raise MultiValueDictKeyError(key)
+
+        return self._values[positions[-1]]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def getlist(self, key, default=None):
+        try:
+            positions = self.schema.index[key]
+        except KeyError:
+            return [] if default is None else default
+
+        return [self._values[position] for position in positions]
+
+    def keys(self):
+        return self.schema.index.keys()
+
+    def items(self):
+        for key in self.schema.index:
+            yield (key, self[key])
+
+    def lists(self):
+        for key in self.schema.index:
+            yield (key, self.getlist(key))
+
+    def values(self):
+        for key in self.schema.index:
+            yield self[key]
+
+    def dict(self):
+        return {key: self[key] for key in self.schema.index}
 
 
 class SurveyPresentationFunction(abc.ABC):
@@ -65,9 +224,20 @@ class Coalesce(SurveyPresentationFunction):
             if value:
                 yield (key, value)
 
+    def present(self, item):
+        (key, value) = item
+
+        if value is True:
+            # checkbox subfields of typed tables are boolean: present their keys
+            # (as their labels were presented by their legacy text columns)
+            return key
+
+        # (values of typed columns, e.g. dates, are presented as strings)
+        return str(self.get_value(item))
+
     def __call__(self, entry):
         getter = self.iteritems_multi if hasattr(entry, 'getlist') else self.iteritems
-        return self.sep.join(self.get_value(item) for item in getter(entry))
+        return self.sep.join(self.present(item) for item in getter(entry))
 
     def __repr__(self):
         return f'{self.__name__}({{keys}}, {self.sep!r})'.format(
@@ -0,0 +1,24 @@
+from django.test import SimpleTestCase
+
+from review import survey
+
+
+class CoalesceTestCase(SimpleTestCase):
+
+    keys = ('Asian', 'Black', 'White')
+
+    def make_entry(self, *values):
+        schema = survey.SurveySchema((f'Field{n}' for n in range(len(values))), self.keys)
+        return schema.record(values)
+
+    def test_legacy_text(self):
+        entry = self.make_entry('Asian', '', 'White')
+        self.assertEqual(survey.Coalesce(*self.keys, sep='; ')(entry), 'Asian; White')
+
+    def test_typed_boolean(self):
+        entry = self.make_entry(True, False, True)
+        self.assertEqual(survey.Coalesce(*self.keys, sep='; ')(entry), 'Asian; White')
+
+    def test_typed_boolean_keys(self):
+        entry = self.make_entry(True, None, True)
+        self.assertEqual(survey.CoalesceKeys(*self.keys)(entry), 'Asian, White')
@@ -0,0 +1,86 @@
+import json
+import pathlib
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+DATA_PATH = pathlib.Path(__file__).parent / 'data'
+
+TABLE_NAME = 'survey_reviewer_2019'
+
+
+@override_settings(REVIEW_WUFOO_HANDSHAKE_KEY='handshake')
+class WufooWebhookTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with (DATA_PATH / 'wufoo_webhook_reviewer.json').open() as fd:
+            cls.payload = json.load(fd)
+
+        # survey table as loaded by loadwufoo
+        with connection.cursor() as cursor:
+            cursor.execute(f'''
+                create table "{TABLE_NAME}" (
+                    "EntryId" character varying primary key,
+                    "Field1" character varying,
+                    "Field2" character varying,
+                    "Field3" character varying,
+                    "Field4" character varying,
+                    "Field7" boolean,
+                    "Field8" boolean,
+                    "DateCreated" timestamp without time zone,
+                    "CreatedBy" character varying,
+                    "DateUpdated" timestamp without time zone,
+                    "UpdatedBy" character varying
+                )
+            ''')
+
+    def post(self, payload):
+        return self.client.post(reverse('wufoo-webhook'), payload)
+
+    def get_entry(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'''select "Field4", "Field7", "Field8", "DateUpdated"::text
+                               from "{TABLE_NAME}" where "EntryId" = %s''',
+                           [self.payload['EntryId']])
+            return cursor.fetchall()
+
+    def test_insert(self):
+        response = self.post(self.payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['table_name'], TABLE_NAME)
+        self.assertEqual(self.get_entry(), [('Analytical Engine Society', True, True, None)])
+
+    def test_update(self):
+        self.post(self.payload)
+
+        response = self.post(dict(self.payload,
+                                  Field4='Difference Engine Society',
+                                  DateUpdated='2019-01-16 14:02:45',
+                                  UpdatedBy='public'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_entry(), [('Difference Engine Society', True, True,
+                                             '2019-01-16 14:02:45')])
+
+    def test_uncheck(self):
+        self.post(self.payload)
+
+        # Wufoo omits the subfields of checkboxes left unchecked
+        payload = dict(self.payload, DateUpdated='2019-01-16 14:02:45', UpdatedBy='public')
+        del payload['Field8']
+
+        response = self.post(payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_entry(), [('Analytical Engine Society', True, False,
+                                             '2019-01-16 14:02:45')])
+
+    def test_forbidden(self):
+        response = self.post(dict(self.payload, HandshakeKey='guess'))
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.get_entry(), [])
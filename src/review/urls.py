@@ -17,6 +17,9 @@ urlpatterns = [
 
     path('report/', views.report, name='report'),
 
+    path('health.json', views.health, name='health'),
+    path('wufoo/webhook/', views.wufoo_webhook, name='wufoo-webhook'),
+
     re_path(r"confirm-email/(?P<key>[-:\w]+)/$",
             views.invite_confirm_email,
             name="account_confirm_email"),
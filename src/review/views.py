@@ -1,5 +1,7 @@
 import functools
+import hmac
 import itertools
+import json
 import urllib
 
 import allauth.account.views
@@ -13,10 +15,12 @@ from django.db import connection, transaction
 from django.shortcuts import redirect, get_object_or_404
 from django.template.response import TemplateResponse
 from django.urls import reverse
-from django.views.decorators.http import require_GET, require_http_methods
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
 from django_tables2 import RequestConfig
 
-from review import models, query, reports
+from review import models, query, reports, webhook, wufoo
 
 
 RATING_FIELDS = models.ApplicationReview.rating_fields()
@@ -177,34 +181,17 @@ def list_applications(request, content_type='html'):
                                         ordered=False)
 
     if query_raw:
+        field_ids = models.SurveyFieldRole.objects.field_ids('application_1')
+
         with connection.cursor() as cursor:
-            # FIXME: assumes survey field IDs
-            #
-            # These could -- and perhaps simply should -- be configured in settings.
-            #
-            # Alternatively, (though not *great*), could look these up, assuming applicant's
-            # are the first listed:
-            #
-            #     select field_id from (
-            #         select distinct on (2) field_id, lower(field_title)
-            #         from survey_application_1_fields_YEAR
-            #         where field_id like 'Field%' and (
-            #             field_title ilike 'first%' or
-            #             field_title ilike 'last%' or
-            #             field_title ilike 'email%'
-            #         ) order by 2, field_id
-            #     ) _fields
-            #     order by field_id
-            #     limit 3
-            #
             cursor.execute(
                 f'''\
                     SELECT "EntryId"
                     FROM "survey_application_1_{settings.REVIEW_PROGRAM_YEAR}"
                     WHERE
-                        LOWER("Field451") IN %(query_terms)s OR
-                        LOWER("Field452") IN %(query_terms)s OR
-                        LOWER("Field461") IN %(query_terms)s
+                        LOWER("{field_ids['app_first']}") IN %(query_terms)s OR
+                        LOWER("{field_ids['app_last']}") IN %(query_terms)s OR
+                        LOWER("{field_ids['app_email']}") IN %(query_terms)s
                 ''',
                 {'query_terms': tuple(query_raw.lower().split())}
             )
@@ -242,6 +229,105 @@ def list_applications(request, content_type='html'):
     })
 
 
+@require_GET
+def health(request):
+    """Report the status of the loads of the program year's survey data,
+    (as JSON, for monitoring).
+
+    Loads are "stale" (with status code 503) if any form's most recent
+    successful load is older than REVIEW_LOAD_MAX_AGE (seconds), or if
+    there have been none.
+
+    """
+    loads = list(models.SurveyLoad.objects.latest_by_form(settings.REVIEW_PROGRAM_YEAR))
+    now = timezone.now()
+
+    stale = not loads or any(
+        (now - load.finished).total_seconds() > settings.REVIEW_LOAD_MAX_AGE
+        for load in loads
+    )
+
+    return http.JsonResponse(
+        {
+            'status': 'stale' if stale else 'ok',
+            'program_year': settings.REVIEW_PROGRAM_YEAR,
+            'loads': [load.summary() for load in loads],
+        },
+        status=503 if stale else 200,
+    )
+
+
+@csrf_exempt
+@require_POST
+def wufoo_webhook(request):
+    """Ingest a Wufoo form submission, as posted by the form's webhook,
+    (with its handshake key, and including its form structure).
+
+    Submissions of forms which are not loaded, (or whose survey tables
+    have not yet been loaded), are ignored, (and left to the next load
+    of survey data).
+
+    """
+    handshake_key = settings.REVIEW_WUFOO_HANDSHAKE_KEY
+
+    if not handshake_key or not hmac.compare_digest(
+        request.POST.get('HandshakeKey', '').encode(),
+        handshake_key.encode(),
+    ):
+        return http.JsonResponse(
+            {
+                'status': 'forbidden',
+                'error': 'not allowed',
+            },
+            status=403,
+        )
+
+    try:
+        form_name = json.loads(request.POST['FormStructure'])['Name']
+    except (KeyError, TypeError, ValueError):
+        return http.JsonResponse(
+            {
+                'status': 'error',
+                'error': 'form structure required',
+            },
+            status=400,
+        )
+
+    form_match = wufoo.match_form(form_name)
+
+    try:
+        if form_match is None:
+            raise LookupError(f"form not loaded: {form_name}")
+
+        (year, name) = form_match
+        (table_name, link) = webhook.ingest(name, int(year), request.POST)
+    except LookupError as exc:
+        return http.JsonResponse(
+            {
+                'status': 'ignored',
+                'error': str(exc),
+            },
+            status=202,
+        )
+    except (ValueError, ArithmeticError) as exc:
+        return http.JsonResponse(
+            {
+                'status': 'error',
+                'error': str(exc),
+            },
+            status=400,
+        )
+
+    (entry, change) = link or (None, None)
+
+    return http.JsonResponse({
+        'status': 'ok',
+        'table_name': table_name,
+        'application_id': entry and entry.application_id,
+        'link': change,
+    })
+
+
 @require_http_methods(['GET', 'POST'])
 @login_required
 @unexpected_review
@@ -370,6 +456,9 @@ REPORT_TABLES = (
     ('app_review', reports.application_review_table),
     ('app_recommendation', reports.application_recommendation_table),
     ('reviewer_review', reports.reviewer_review_table),
+    ('interview_round', reports.interview_round_table),
+    ('interview_recommendation', reports.interview_recommendation_table),
+    ('interviewer_review', reports.interviewer_review_table),
 )
 
 
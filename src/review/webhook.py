@@ -0,0 +1,82 @@
+"""Ingestion of Wufoo form submissions, as posted by Wufoo webhooks.
+
+Submissions are upserted into their forms' (previously loaded) survey
+tables, and linked to their applicants' applications, such that these
+are available without awaiting the next load of survey data.
+
+"""
+from django.db import connection, transaction
+
+from review import models, wufoo
+
+
+ENTITY_ID_FIELD = 'EntryId'
+
+# models of survey entries linked to applications, by form name
+LINKED_ENTRY_MODELS = {
+    'application_1': models.ApplicationPage,
+    'application_2': models.ApplicationPage,
+    'recommendation': models.Reference,
+}
+
+
+def ingest(form_name, program_year, data):
+    """Upsert the given form submission into its survey table, and link
+    it to its applicant's application, (in one transaction).
+
+    Raises LookupError if the form's survey table has not been loaded,
+    and ValueError (or ArithmeticError) for invalid submissions.
+
+    Returns the survey table name, and the link of the entry, (and
+    whether it was created or updated), if any.
+
+    """
+    table_name = f'survey_{form_name}_{program_year}'
+    table_columns = models.get_survey_columns(table_name)
+
+    if not table_columns:
+        raise LookupError(f"survey table not loaded: {table_name}")
+
+    entity_code = data.get(ENTITY_ID_FIELD)
+    if not entity_code:
+        raise ValueError(f"submission missing {ENTITY_ID_FIELD}")
+
+    # Wufoo omits the subfields of checkboxes left unchecked: these are
+    # set (to false) regardless, lest they remain checked upon update
+    columns = [(column_name, column_type) for (column_name, column_type) in table_columns
+               if column_name in data or column_type == 'boolean']
+    values = [wufoo.parse_value(column_type, data.get(column_name))
+              for (column_name, column_type) in columns]
+
+    column_list = ', '.join(f'"{column_name}"' for (column_name, _column_type) in columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    update_columns = ', '.join(f'"{column_name}" = excluded."{column_name}"'
+                               for (column_name, _column_type) in columns
+                               if column_name != ENTITY_ID_FIELD)
+    conflict_action = f'update set {update_columns}' if update_columns else 'nothing'
+
+    entry_model = LINKED_ENTRY_MODELS.get(form_name)
+    link = None
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'insert into "{table_name}" ({column_list}) values ({placeholders}) '
+                f'on conflict ("{ENTITY_ID_FIELD}") do {conflict_action}',
+                values,
+            )
+
+        if entry_model is not None:
+            email_field = models.SurveyFieldRole.objects.field_id(form_name, 'app_email', program_year)
+            applicant_email = data.get(email_field, '').strip()
+
+            if not applicant_email:
+                raise ValueError(f"submission missing applicant email ({email_field})")
+
+            link = entry_model.objects.link(table_name,
+                                            ENTITY_ID_FIELD,
+                                            entity_code,
+                                            applicant_email,
+                                            program_year)
+
+    return (table_name, link)
@@ -0,0 +1,304 @@
+"""Wufoo API client for the retrieval of forms, their fields and their
+entries, (and helpers for the identification of forms and the parsing of
+their entries).
+
+Entry pages are retrieved concurrently, (by a bounded pool of worker
+threads), and generated in order; requests which are rate-limited or
+which otherwise fail transiently are retried with backoff.
+
+Responses may be cached on disk (see `ResponseCache`).
+
+"""
+import collections
+import concurrent.futures
+import datetime
+import decimal
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import pathlib
+import random
+import re
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+
+
+API_URL = 'https://{account_name}.wufoo.com/api/v3/'
+
+# Wufoo ignores the password of API (basic) authentication
+API_PASSWORD = 'footastic'
+
+ENTRY_PAGE_SIZE = 100  # (Also the API maximum)
+
+RETRY_STATUS_CODES = frozenset((429, 500, 502, 503, 504))
+
+
+# entry search filter parameter (as in pyfoo)
+SearchParameter = collections.namedtuple('SearchParameter', ('field', 'operator', 'value'))
+
+
+# regular expressions to identify forms to load
+# and to capture their canonical names (case-insensitive)
+
+RECOMMENDATION_FORM = r'^(\d+) dssg fellow (recommendation) form$'
+
+APPLICATION_FORM = r'^(\d+) dssg fellowship (application)(?:(?:[- ]+part)? (\d))?$'
+
+REVIEWER_FORM = r'^(\d+) dssg application (reviewer)(?: and scoper)? (?:registration|signup)$'
+
+FORMS = (
+    RECOMMENDATION_FORM,
+    APPLICATION_FORM,
+    REVIEWER_FORM,
+)
+
+
+def match_form(form_name, name_expressions=FORMS):
+    """Match the given form name against regular expression(s), returning
+    the (year, canonical name) of the form (if any).
+
+    """
+    for name_expression in name_expressions:
+        match = re.search(name_expression, form_name, re.I)
+
+        if match:
+            (year, *names) = match.groups()
+            return (year, '_'.join(filter(None, names)).lower())
+
+    return None
+
+
+def parse_value(field_type, value):
+    """Parse the given entry value (as formatted by Wufoo) according
+    to the given column type.
+
+    Empty values are parsed as None (NULL), except for those of
+    checkboxes, which are parsed as False.
+
+    """
+    if isinstance(value, str):
+        value = value.strip()
+
+    if field_type == 'boolean':
+        return bool(value)
+
+    if value is None or value == '':
+        return None
+
+    if field_type == 'date':
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+
+    if field_type == 'timestamp without time zone':
+        return datetime.datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+
+    if field_type == 'numeric':
+        return decimal.Decimal(value.replace(',', ''))
+
+    return str(value)
+
+
+class WufooAPIError(Exception):
+    pass
+
+
+class ResponseCache:
+    """On-disk cache of (gzip-compressed) API responses, addressed by
+    the digest of their request URL, (and as such by form hash, page
+    offset and filter).
+
+    Cached responses expire after `ttl` seconds, (if specified). In
+    `replay` mode, cached responses never expire, and no response may
+    be requested which is not cached.
+
+    """
+    def __init__(self, path, ttl=None, replay=False):
+        self.path = pathlib.Path(path)
+        self.ttl = ttl
+        self.replay = replay
+
+    def get_path(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.path / digest[:2] / f'{digest}.json.gz'
+
+    def get(self, url):
+        path = self.get_path(url)
+
+        try:
+            if not self.replay and self.ttl is not None:
+                if time.time() - path.stat().st_mtime > self.ttl:
+                    return None
+
+            with gzip.open(path, 'rt', encoding='utf-8') as infile:
+                return json.load(infile)['response']
+        except FileNotFoundError:
+            return None
+
+    def put(self, url, response):
+        path = self.get_path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write atomically (pages are cached concurrently)
+        path_tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}')
+
+        with gzip.open(path_tmp, 'wt', encoding='utf-8') as outfile:
+            json.dump({'url': url, 'response': response}, outfile)
+
+        os.replace(path_tmp, path)
+
+
+class Client:
+    """Wufoo API client for the retrieval of forms, their fields and
+    their entries.
+
+    `api_url` defaults to that of the given Wufoo account; but, may be
+    specified, (e.g. to target a local stub of the API).
+
+    """
+    def __init__(self, account_name, api_key, api_url=None,
+                 concurrency=4, retries=5, backoff=1.0, timeout=60,
+                 cache=None, log=None):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.api_url = (api_url or API_URL.format(account_name=account_name)).rstrip('/') + '/'
+        self.auth = (api_key, API_PASSWORD)
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.log = log
+
+        # size of API responses received (rather than read from cache)
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+        # requests.Session is not guaranteed thread-safe: one per thread
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        try:
+            return self._local.session
+        except AttributeError:
+            self._local.session = requests.Session()
+            return self._local.session
+
+    def get_retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return int(retry_after)
+
+        # exponential backoff with jitter
+        return self.backoff * (2 ** attempt) * random.uniform(1, 1.5)
+
+    def get(self, path, params=(), query=None):
+        """Retrieve the JSON resource at the given API path, (from the
+        cache, if any), retrying transient failures.
+
+        """
+        url = self.api_url + path
+        query_string = '&'.join(filter(None, (urlencode(params), query)))
+        if query_string:
+            url += '?' + query_string
+
+        if self.cache is None:
+            return self.request(path, url)
+
+        data = self.cache.get(url)
+
+        if data is None:
+            if self.cache.replay:
+                raise WufooAPIError(f'{path}: response not cached (replay only)')
+
+            data = self.request(path, url)
+            self.cache.put(url, data)
+
+        return data
+
+    def request(self, path, url):
+        """Request the JSON resource at the given URL, retrying
+        transient failures.
+
+        """
+        for attempt in itertools.count():
+            try:
+                response = self.session.get(url, auth=self.auth, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt >= self.retries:
+                    raise WufooAPIError(f'{path}: {exc}') from exc
+
+                delay = self.get_retry_delay(attempt)
+                reason = exc.__class__.__name__
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    try:
+                        response.raise_for_status()
+                    except requests.HTTPError as exc:
+                        raise WufooAPIError(f'{path}: {exc}') from exc
+
+                    with self._lock:
+                        self.bytes_received += len(response.content)
+
+                    return response.json()
+
+                if attempt >= self.retries:
+                    raise WufooAPIError(f'{path}: HTTP {response.status_code} '
+                                        f'(after {attempt} retries)')
+
+                delay = self.get_retry_delay(attempt, response)
+                reason = f'HTTP {response.status_code}'
+
+            if self.log:
+                self.log(f'\t[retry] {path} ({reason}) in {delay:.1f}s')
+
+            time.sleep(delay)
+
+    def get_forms(self):
+        return self.get('forms.json')['Forms']
+
+    def get_fields(self, form_hash):
+        return self.get(f'forms/{form_hash}/fields.json')['Fields']
+
+    def get_entries(self, form_hash, page_start=0, page_size=ENTRY_PAGE_SIZE, filter_string=None):
+        return self.get(
+            f'forms/{form_hash}/entries.json',
+            (('pageStart', page_start), ('pageSize', page_size)),
+            filter_string,
+        )['Entries']
+
+    def stream_entries(self, form_hash, page_size=ENTRY_PAGE_SIZE, filter_string=None):
+        """Generate form entries, in order, from pages retrieved
+        concurrently.
+
+        Pages beyond the last (partial) page may be requested, (up to
+        one fewer than the client's concurrency), and are discarded.
+
+        """
+        get_page = lambda page_start: self.get_entries(form_hash, page_start, page_size, filter_string)
+        page_starts = itertools.count(step=page_size)
+
+        with concurrent.futures.ThreadPoolExecutor(self.concurrency) as executor:
+            pending = collections.deque(
+                executor.submit(get_page, page_start)
+                for page_start in itertools.islice(page_starts, self.concurrency)
+            )
+
+            try:
+                while pending:
+                    entries = pending.popleft().result()
+                    yield from entries
+
+                    if len(entries) < page_size:
+                        break
+
+                    pending.append(executor.submit(get_page, next(page_starts)))
+            finally:
+                for future in pending:
+                    future.cancel()